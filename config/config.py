@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 
 @dataclass
 class SystemConfig:
@@ -9,4 +9,39 @@ class SystemConfig:
     max_crowd_density: float = 0.75
     restricted_areas: List[List[Tuple[int, int]]] = None
     working_hours: Tuple[int, int] = (9, 17)
-    enable_pose_detection: bool = False
\ No newline at end of file
+    enable_pose_detection: bool = False
+    clustering_engine: str = 'dbscan'  # 'dbscan' or 'grid' (same clusters, grid-hashed neighbour search)
+    cluster_eps: float = 30.0
+    cluster_min_samples: int = 3
+    cluster_reuse_tolerance: float = 5.0  # max centroid shift (px) to reuse last clustering
+    enable_crowd_flow: bool = True
+    flow_interval: int = 5  # compute optical flow every Nth analysed frame
+    flow_scale: float = 0.25  # capped at 1/4 resolution
+    flow_zones: Tuple[int, int] = (3, 3)  # zone grid rows, cols
+    flow_min_speed: float = 1.0  # px per analysed frame to count as moving
+    flow_min_coverage: float = 0.05
+    counter_flow_ratio: float = 0.5
+    stampede_speed: float = 12.0
+    stampede_min_coverage: float = 0.3
+    enable_density_counting: bool = False
+    density_count_threshold: int = 80  # switch to density-map counting above this many detections
+    density_model_path: str = 'models/density_model.pth'
+    density_input_width: int = 640
+    density_hotspot_cell: int = 80  # hotspot grid cell size in frame pixels
+    alert_cooldown_seconds: float = 30.0  # suppression window per (camera, type, zone, track)
+    alert_cooldowns: Dict[str, float] = None  # per alert type overrides
+    alert_severities: Dict[str, str] = None  # per alert type overrides of the default severities
+    alert_zone_size: int = 100  # grid size (px) used to derive a zone from an alert location
+    alert_queue_size: int = 1000  # undelivered alerts kept in memory
+    alert_overflow_policy: str = 'drop_oldest'  # 'drop_oldest', 'coalesce' or 'spill'
+    alert_spill_dir: str = 'data/alert_spill'
+    alert_spill_segment_size: int = 1000  # alerts per on-disk segment
+    alert_spill_max_segments: int = 100
+    event_count_delta: int = 3  # log a count_change once the person count moves this much
+    event_keyframe_interval: float = 60.0  # seconds between keyframe summaries
+    track_max_distance: float = 75.0  # px a person may move between frames and keep their track
+    track_timeout: float = 2.0  # seconds unseen before a track ends
+    cameras: Dict[str, str] = None  # camera_id -> capture source (device index or URL) for the API app
+    inference_workers: int = 1  # detector processes used by the API app
+    leader_lock_path: str = 'data/leader.lock'  # the API worker holding this lock owns cameras and processing
+    settings_path: str = 'data/settings.json'  # runtime overrides written by PUT /api/settings
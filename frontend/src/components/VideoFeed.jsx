@@ -1,52 +1,82 @@
 import React, { useState, useEffect, useRef } from 'react';
 // import { Card, CardContent } from '@/components/ui/card';
 import { Camera } from 'lucide-react';
+import { api } from '../services/api';
 
-const VideoFeed = () => {
-  const [imageUrl, setImageUrl] = useState(null);
-  const eventSourceRef = useRef(null);
+const API_BASE_URL = process.env.REACT_APP_API_BASE_URL || 'http://localhost:8000';
+
+const VideoFeed = ({ cameraId }) => {
+  // Without a cameraId prop, offer the cameras the backend reports
+  const [cameras, setCameras] = useState([]);
+  const [selected, setSelected] = useState(cameraId || null);
+  // MJPEG streams straight into the <img>; bumping the key reconnects it
+  const [streamKey, setStreamKey] = useState(0);
+  const [loaded, setLoaded] = useState(false);
+  const retryRef = useRef(null);
 
   useEffect(() => {
-    // Create EventSource for Server-Sent Events
-    eventSourceRef.current = new EventSource('http://localhost:8000/video-feed');
-
-    eventSourceRef.current.onmessage = (event) => {
-      setImageUrl(event.data);
-    };
-
-    eventSourceRef.current.onerror = (error) => {
-      console.error('EventSource error:', error);
-      eventSourceRef.current.close();
-      // Attempt to reconnect after 5 seconds
-      setTimeout(() => {
-        eventSourceRef.current = new EventSource('http://localhost:8000/video-feed');
-      }, 5000);
-    };
-
-    return () => {
-      if (eventSourceRef.current) {
-        eventSourceRef.current.close();
-      }
-    };
-  }, []);
+    if (cameraId) {
+      setSelected(cameraId);
+      return;
+    }
+    api.getCameras()
+      .then((list) => {
+        setCameras(list);
+        setSelected((current) => current || (list[0] && list[0].id) || null);
+      })
+      .catch((error) => console.error('Error fetching cameras:', error));
+  }, [cameraId]);
+
+  useEffect(() => setLoaded(false), [selected]);
+
+  const handleError = (error) => {
+    console.error('Video feed error:', error);
+    setLoaded(false);
+    // Attempt to reconnect after 5 seconds
+    clearTimeout(retryRef.current);
+    retryRef.current = setTimeout(() => setStreamKey((key) => key + 1), 5000);
+  };
+
+  useEffect(() => () => clearTimeout(retryRef.current), []);
+
+  const feedUrl = selected
+    ? `${API_BASE_URL}/video/${encodeURIComponent(selected)}/mjpeg?annotated=true&retry=${streamKey}`
+    : null;
 
   return (
     <div className="w-full">
       <div className="p-4 flex flex-row items-center justify-between">
         <h2 className="text-lg font-semibold">Live Feed</h2>
-        <Camera className="h-6 w-6" />
+        <div className="flex items-center gap-2">
+          {!cameraId && cameras.length > 1 && (
+            <select
+              value={selected || ''}
+              onChange={(e) => setSelected(e.target.value)}
+              className="border rounded px-2 py-1 text-sm"
+            >
+              {cameras.map((camera) => (
+                <option key={camera.id} value={camera.id}>{camera.id}</option>
+              ))}
+            </select>
+          )}
+          <Camera className="h-6 w-6" />
+        </div>
       </div>
       <div>
         <div className="aspect-video bg-black rounded-lg overflow-hidden">
-          {imageUrl ? (
+          {feedUrl && (
             <img
-              src={imageUrl}
+              key={`${selected}-${streamKey}`}
+              src={feedUrl}
               alt="CCTV Feed"
-              className="w-full h-full object-cover"
+              className={loaded ? 'w-full h-full object-cover' : 'hidden'}
+              onLoad={() => setLoaded(true)}
+              onError={handleError}
             />
-          ) : (
+          )}
+          {!loaded && (
             <div className="w-full h-full flex items-center justify-center text-white">
-              Loading video feed...
+              {selected ? 'Loading video feed...' : 'No camera available'}
             </div>
           )}
         </div>
@@ -11,12 +11,37 @@ from typing import Tuple, Dict, Optional
 warnings.filterwarnings("ignore", category=FutureWarning, 
                       message=".*torch.cuda.amp.autocast.*")
 
+# Packed detection box: int16 pixel geometry plus float16 confidence, 10 bytes
+BOX_DTYPE = np.dtype([
+    ('x', '<i2'), ('y', '<i2'), ('width', '<i2'), ('height', '<i2'), ('confidence', '<f2')
+])
+
+def encode_boxes(boxes: list) -> bytes:
+    """Pack detection box dicts into the compact binary format"""
+    packed = np.empty(len(boxes), dtype=BOX_DTYPE)
+    for field in BOX_DTYPE.names:
+        packed[field] = [box[field] for box in boxes]
+    return packed.tobytes()
+
+def decode_boxes(blob: bytes) -> np.ndarray:
+    """Unpack binary detection boxes into a structured numpy array"""
+    return np.frombuffer(blob or b'', dtype=BOX_DTYPE)
+
+def boxes_to_dicts(boxes: np.ndarray) -> list:
+    """Turn decoded binary boxes back into the dicts stored in JSON rows"""
+    return [{field: box[field].item() for field in BOX_DTYPE.names} for box in boxes]
+
 class CrowdAnalytics:
-    def __init__(self, db_path='crowd_analytics.db'):
+    def __init__(self, db_path='crowd_analytics.db', binary_boxes=False):
         """
         Initialize Crowd Analytics module with YOLO model and database
+
+        With binary_boxes, detection boxes are stored as packed int16/float16
+        blobs instead of JSON text; get_historical_arrays reads those
+        without per-row parsing.
         """
         self.db_path = db_path
+        self.binary_boxes = binary_boxes
         
         # Load YOLOv5 model
         self.model = torch.hub.load('ultralytics/yolov5', 'yolov5s', pretrained=True)
@@ -42,6 +67,7 @@ class CrowdAnalytics:
                         density_level INTEGER,
                         people_count INTEGER,
                         detection_boxes TEXT,
+                        detection_boxes_bin BLOB,
                         frame_width INTEGER,
                         frame_height INTEGER
                     )
@@ -143,17 +169,19 @@ class CrowdAnalytics:
         try:
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
+                boxes = analysis_data['detection_boxes']
                 cursor.execute('''
                     INSERT INTO crowd_density 
                     (timestamp, location, density_level, people_count, detection_boxes,
-                     frame_width, frame_height)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                     detection_boxes_bin, frame_width, frame_height)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
                 ''', (
                     analysis_data['timestamp'],
                     analysis_data['location'],
                     analysis_data['density_level'],
                     analysis_data['people_count'],
-                    json.dumps(analysis_data['detection_boxes']),
+                    None if self.binary_boxes else json.dumps(boxes),
+                    encode_boxes(boxes) if self.binary_boxes else None,
                     analysis_data['frame_width'],
                     analysis_data['frame_height']
                 ))
@@ -164,14 +192,14 @@ class CrowdAnalytics:
     def get_historical_data(self, start_time: datetime.datetime,
                           end_time: datetime.datetime,
                           location: Optional[str] = None) -> list:
-        """Retrieve historical crowd data"""
+        """Retrieve historical crowd data, with detection boxes as dicts however they were stored"""
         try:
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
                 
                 query = '''
                     SELECT timestamp, location, density_level, people_count,
-                           detection_boxes, frame_width, frame_height
+                           detection_boxes, detection_boxes_bin, frame_width, frame_height
                     FROM crowd_density
                     WHERE timestamp BETWEEN ? AND ?
                 '''
@@ -186,13 +214,14 @@ class CrowdAnalytics:
                 results = []
                 for row in cursor.fetchall():
                     results.append({
-                        'timestamp': datetime.datetime.strptime(row[0], '%Y-%m-%d %H:%M:%S.%f'),
+                        'timestamp': datetime.datetime.fromisoformat(row[0]),
                         'location': row[1],
                         'density_level': row[2],
                         'people_count': row[3],
-                        'detection_boxes': json.loads(row[4]),
-                        'frame_width': row[5],
-                        'frame_height': row[6]
+                        'detection_boxes': (boxes_to_dicts(decode_boxes(row[5])) if row[5] is not None
+                                            else json.loads(row[4])),
+                        'frame_width': row[6],
+                        'frame_height': row[7]
                     })
                 
                 return results
@@ -200,6 +229,42 @@ class CrowdAnalytics:
             print(f"Database error while retrieving historical data: {e}")
             return []
 
+    def get_historical_arrays(self, start_time: datetime.datetime,
+                              end_time: datetime.datetime,
+                              location: Optional[str] = None) -> Dict[str, np.ndarray]:
+        """
+        Retrieve historical crowd data as columnar numpy arrays
+
+        All binary box blobs are joined and decoded in one np.frombuffer call;
+        the boxes of row i are boxes[offsets[i]:offsets[i + 1]]. Rows stored
+        as JSON text are skipped.
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                query = '''
+                    SELECT timestamp, people_count, detection_boxes_bin
+                    FROM crowd_density
+                    WHERE timestamp BETWEEN ? AND ? AND detection_boxes_bin IS NOT NULL
+                '''
+                params = [start_time, end_time]
+                if location:
+                    query += ' AND location = ?'
+                    params.append(location)
+                rows = conn.execute(query, params).fetchall()
+        except sqlite3.Error as e:
+            print(f"Database error while retrieving historical data: {e}")
+            rows = []
+
+        timestamps, counts, blobs = zip(*rows) if rows else ((), (), ())
+        lengths = np.fromiter((len(blob) // BOX_DTYPE.itemsize for blob in blobs),
+                              dtype=np.int64, count=len(blobs))
+        return {
+            'timestamp': np.array(timestamps, dtype='datetime64[us]'),
+            'people_count': np.array(counts, dtype=np.int32),
+            'boxes': decode_boxes(b''.join(blobs)),
+            'offsets': np.concatenate(([0], np.cumsum(lengths)))
+        }
+
 def main():
     try:
         print("Starting YOLO crowd analytics... Press 'q' to quit")
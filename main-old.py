@@ -26,6 +26,8 @@ from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import sessionmaker
 from fastapi.middleware.cors import CORSMiddleware
 from datetime import time
+from src.routes.video import router as video_router, frame_hub
+from src.utils.delta_protocol import DeltaSession
 # Configuration and logging setup
 logging.basicConfig(
     level=logging.INFO,
@@ -45,9 +47,10 @@ class SystemConfig:
     
 class VideoStream:
     """Handles video stream capture and preprocessing"""
-    def __init__(self, source: str, config: SystemConfig):
+    def __init__(self, source: str, config: SystemConfig, camera_id: str = None):
         self.source = source
         self.config = config
+        self.camera_id = camera_id
         self.capture = cv2.VideoCapture(source)
         
         # Check if camera opened successfully
@@ -99,6 +102,8 @@ class VideoStream:
                             except queue.Empty:
                                 pass
                             self.frame_queue.put(processed_frame)
+                        # Video viewers read from the hub, not the processing queue
+                        frame_hub.publish(self.camera_id, processed_frame)
                             
                 frame_count += 1
                 
@@ -448,7 +453,7 @@ class CCTVSystem:
         
     def add_camera(self, camera_id: str, source: str):
         """Add new camera stream"""
-        stream = VideoStream(source, self.config)
+        stream = VideoStream(source, self.config, camera_id)
         self.video_streams[camera_id] = stream
         stream.start()
         
@@ -509,6 +514,9 @@ app.add_middleware(
     expose_headers=["Content-Type", "Cache-Control"]
 )
 
+# MJPEG (/video/{camera_id}/mjpeg) and binary websocket (/ws/video/{camera_id}) feeds
+app.include_router(video_router)
+
 class ConnectionManager:
     def __init__(self):
         self.active_connections: list[WebSocket] = []
@@ -638,21 +646,20 @@ def preprocess_frame(frame):
 
 @app.get("/video-feed")
 async def video_feed():
+    """Legacy base64 SSE feed, kept for old clients; prefer /video/{camera_id}/mjpeg"""
     async def generate_frames():
+        seq = 0
+        loop = asyncio.get_running_loop()
         while True:
             try:
-                # Get frame from the video stream
-                frame = system.video_streams['test_cam'].frame_queue.get()
-                if frame is not None:
-                    # Convert frame to JPEG format
-                    _, buffer = cv2.imencode('.jpg', cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
-                    frame_bytes = base64.b64encode(buffer.tobytes()).decode('utf-8')
-                    # Yield the frame with proper format
-                    yield f"data: data:image/jpeg;base64,{frame_bytes}\n\n"
-                await asyncio.sleep(0.1)
+                # Wait for a newer frame without blocking the event loop
+                await frame_hub.next_frame('test_cam', seq)
+                seq, _, jpeg = await loop.run_in_executor(None, frame_hub.jpeg, 'test_cam', 'full')
+                frame_bytes = base64.b64encode(jpeg).decode('utf-8')
+                yield f"data: data:image/jpeg;base64,{frame_bytes}\n\n"
             except Exception as e:
                 logger.error(f"Error in video feed: {str(e)}")
-                continue
+                await asyncio.sleep(0.1)
 
     return StreamingResponse(
         generate_frames(),
@@ -660,8 +667,34 @@ async def video_feed():
     )
 
 @app.websocket("/ws/metrics")
-async def websocket_endpoint(websocket: WebSocket):
+async def websocket_endpoint(websocket: WebSocket, protocol: str = 'json'):
+    """
+    Live metrics; ?protocol=delta opts into msgpack deltas against the
+    client's last acknowledged snapshot (see src/utils/delta_protocol.py)
+    """
     await manager.connect(websocket)
+    session = DeltaSession() if protocol == 'delta' else None
+    ack_reader = None
+
+    async def send(payload: dict):
+        if session is None:
+            await websocket.send_text(json.dumps(payload, default=str))
+            return
+        message = session.encode(payload)
+        if isinstance(message, bytes):
+            await websocket.send_bytes(message)
+        else:
+            await websocket.send_text(message)
+
+    async def read_acks():
+        while True:
+            message = await websocket.receive()
+            if message['type'] == 'websocket.disconnect':
+                break
+            session.receive(message.get('bytes') or message.get('text'))
+
+    if session is not None:
+        ack_reader = asyncio.create_task(read_acks())
     
     try:
         while True:
@@ -676,7 +709,7 @@ async def websocket_endpoint(websocket: WebSocket):
                     )
                 except (asyncio.TimeoutError, queue.Empty):
                     # Send heartbeat if no frame available
-                    await websocket.send_json({
+                    await send({
                         "status": "active",
                         "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                     })
@@ -723,9 +756,7 @@ async def websocket_endpoint(websocket: WebSocket):
                         'timestamp': current_time.strftime('%Y-%m-%d %H:%M:%S')
                     }
                     
-                    # Ensure all data is JSON serializable
-                    json_stats = json.dumps(stats, default=str)
-                    await websocket.send_text(json_stats)
+                    await send(stats)
                     
                 except Exception as e:
                     logger.error(f"Frame processing error: {str(e)}")
@@ -734,7 +765,7 @@ async def websocket_endpoint(websocket: WebSocket):
                         'status': 'error',
                         'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                     }
-                    await websocket.send_json(error_response)
+                    await send(error_response)
                 
             except WebSocketDisconnect:
                 logger.info("Client disconnected")
@@ -748,13 +779,15 @@ async def websocket_endpoint(websocket: WebSocket):
                         'status': 'error',
                         'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                     }
-                    await websocket.send_json(error_response)
+                    await send(error_response)
                 except:
                     break
                     
             await asyncio.sleep(0.1)
             
     finally:
+        if ack_reader:
+            ack_reader.cancel()
         manager.disconnect(websocket)
         
 
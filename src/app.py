@@ -0,0 +1,121 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import yaml
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from config.config import SystemConfig
+from .core.cctv_system import CCTVSystem
+from .core.inference_pool import InferencePool
+from .database.handlers import DatabaseHandler
+from .routes import api, metrics, video
+from .utils.leader import LeaderLock
+from .utils.logging_setup import logger
+from .utils.settings_store import apply_settings, load_settings, settings_mtime
+
+async def _process_camera(system: CCTVSystem, pool: InferencePool, analysis: ThreadPoolExecutor, camera_id: str):
+    """
+    Detect on the newest frame in a worker process, then analyze it; frames that arrive meanwhile are skipped
+
+    The hub receives every captured frame for viewers, so analysis waits
+    until at least frame_skip frames have passed since the last one.
+
+    Detection runs in parallel across cameras. Analysis goes through the
+    single analysis thread because the analyzers, alert system and event
+    policy are shared by all cameras and are not thread-safe.
+    """
+    loop = asyncio.get_running_loop()
+    seq = 0
+    while True:
+        seq, _, frame = await system.frame_hub.next_frame(camera_id, seq + max(1, system.config.frame_skip) - 1)
+        try:
+            detections = await pool.detect(frame)
+            await loop.run_in_executor(analysis, system.analyze_frame, camera_id, frame, detections)
+        except Exception as e:
+            logger.error(f"Processing error on camera '{camera_id}': {e}")
+            await asyncio.sleep(1)
+
+async def _watch_settings(config: SystemConfig, interval: float = 2.0):
+    """Apply overrides saved by PUT /api/settings in any worker"""
+    seen = None
+    while True:
+        mtime = settings_mtime(config.settings_path)
+        if mtime != seen:
+            seen = mtime
+            apply_settings(config, load_settings(config.settings_path))
+        await asyncio.sleep(interval)
+
+def create_app(config_path: str = 'config/config.yml') -> FastAPI:
+    """
+    Build the API application
+
+    Models, camera streams and the database pool are created once in the
+    lifespan handler. With several uvicorn workers, the worker that wins
+    the leader lock captures, runs inference and writes; the others only
+    serve stored data. Live video and metrics are held in the leader's
+    memory, so run live clients against a single worker (or route them
+    to the leader).
+    """
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        with open(config_path, 'r') as f:
+            config_dict = yaml.safe_load(f)
+        db_config = config_dict.pop('db_config', {})
+        config = SystemConfig(**config_dict)
+
+        lock = LeaderLock(config.leader_lock_path)
+        system, pool, analysis, tasks = None, None, None, []
+        if lock.acquire():
+            system = CCTVSystem(config_path, metrics.metrics_state, video.frame_hub, load_detector=False)
+            config = system.config
+            apply_settings(config, load_settings(config.settings_path))
+            pool = InferencePool(config, config.inference_workers)
+            analysis = ThreadPoolExecutor(max_workers=1, thread_name_prefix='analysis')
+            for camera_id, source in (config.cameras or {}).items():
+                try:
+                    system.add_camera(camera_id, source)
+                except ValueError as e:
+                    logger.error(f"Camera '{camera_id}' unavailable: {e}")
+            tasks = [asyncio.create_task(_process_camera(system, pool, analysis, camera_id))
+                     for camera_id in system.video_streams]
+            tasks.append(asyncio.create_task(_watch_settings(config)))
+            metrics.broadcaster.attach_alerts(system.alert_system.bus, system.alert_system.alert_queue)
+            metrics.setup(system.db_handler, db_config)
+        else:
+            logger.info("Another worker owns the cameras, serving stored data only")
+            metrics.setup(DatabaseHandler(db_config), db_config)
+        api.setup(config)
+        app.state.leader = lock.is_leader
+
+        yield
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await metrics.shutdown()
+        if pool:
+            pool.close()
+        if analysis:
+            analysis.shutdown(wait=True)
+        if system:
+            system.stop()
+        else:
+            metrics.db_handler.close()
+        lock.release()
+
+    app = FastAPI(title="ByteLocker CCTV", lifespan=lifespan)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["Content-Type", "Cache-Control", "X-Next-Cursor", "X-Frame-Seq", "ETag", "Last-Modified"]
+    )
+    app.include_router(api.router)
+    app.include_router(metrics.router)
+    app.include_router(video.router)
+    return app
+
+# uvicorn src.app:app --workers 4
+app = create_app()
@@ -0,0 +1,101 @@
+import asyncio
+import threading
+from typing import Callable, Dict, Iterable, Optional
+from ..utils.logging_setup import logger
+
+class AlertSubscription:
+    """A subscriber's bounded alert queue, bound to its event loop"""
+    def __init__(self, loop: asyncio.AbstractEventLoop, cameras: Optional[Iterable[str]] = None,
+                 types: Optional[Iterable[str]] = None, maxsize: int = 100,
+                 severities: Optional[Iterable[str]] = None,
+                 predicate: Optional[Callable[[Dict], bool]] = None):
+        self.loop = loop
+        self.cameras = set(cameras) if cameras else None
+        self.types = set(types) if types else None
+        self.severities = set(severities) if severities else None
+        self.predicate = predicate  # extra filter, called from the publishing thread
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def matches(self, alert: Dict) -> bool:
+        """Check an alert against the camera, type and severity filters"""
+        if self.cameras is not None and alert.get('camera_id') not in self.cameras:
+            return False
+        if self.types is not None and alert.get('type') not in self.types:
+            return False
+        if self.severities is not None and alert.get('severity') not in self.severities:
+            return False
+        if self.predicate is not None and not self.predicate(alert):
+            return False
+        return True
+
+    def _offer(self, alert: Dict):
+        """Enqueue an alert, dropping the oldest one if the queue is full (loop thread only)"""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(alert)
+
+    async def get(self) -> Dict:
+        """Wait for the next alert"""
+        return await self.queue.get()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Dict:
+        return await self.queue.get()
+
+class AlertBus:
+    """Pushes alerts to every matching subscriber as soon as they are published"""
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, cameras: Optional[Iterable[str]] = None, types: Optional[Iterable[str]] = None,
+                  maxsize: int = 100, severities: Optional[Iterable[str]] = None,
+                  predicate: Optional[Callable[[Dict], bool]] = None) -> AlertSubscription:
+        """Create a subscription on the running event loop"""
+        subscription = AlertSubscription(asyncio.get_running_loop(), cameras, types, maxsize, severities, predicate)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: AlertSubscription):
+        """Remove a subscription"""
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, alert: Dict) -> int:
+        """
+        Publish an alert from any thread
+
+        Returns:
+            Number of subscriptions the alert was delivered to
+        """
+        with self._lock:
+            subscriptions = [s for s in self._subscriptions if s.matches(alert)]
+
+        try:
+            current_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            current_loop = None
+
+        delivered = 0
+        for subscription in subscriptions:
+            try:
+                if subscription.loop is current_loop:
+                    subscription._offer(alert)
+                else:
+                    subscription.loop.call_soon_threadsafe(subscription._offer, alert)
+                delivered += 1
+            except RuntimeError:
+                # Event loop already closed, the subscriber is gone
+                logger.warning("Dropping alert subscription bound to a closed event loop")
+                self.unsubscribe(subscription)
+        return delivered
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscriptions)
@@ -1,24 +1,59 @@
 from datetime import datetime
-import queue
-from typing import Dict, List
+import time
+from typing import Dict, List, Optional, Tuple
 from config.config import SystemConfig
-from fastapi import WebSocket
 from ..utils.logging_setup import logger
-import json
-import asyncio
+from ..utils.alert_queue import BoundedAlertQueue
+from .alert_bus import AlertBus
+
+SEVERITY_LEVELS = ('low', 'medium', 'high', 'critical')
+DEFAULT_SEVERITIES = {
+    'stampede_risk': 'critical',
+    'high_crowd_density': 'high',
+    'counter_flow': 'high',
+    'safety_violation': 'medium',
+    'behavior_anomaly': 'medium'
+}
+
+def alert_severity(alert_type: str, overrides: Optional[Dict[str, str]] = None) -> str:
+    """Severity level for an alert type, with per-type overrides from config"""
+    return (overrides or {}).get(alert_type, DEFAULT_SEVERITIES.get(alert_type, 'low'))
 
 class AlertSystem:
     """Handles alert generation and notification"""
     def __init__(self, config: SystemConfig):
         self.config = config
-        self.alert_queue = queue.Queue()
+        self.bus = AlertBus()
+        # Alerts no live subscriber received; /ws/metrics replays them on connect
+        self.alert_queue = BoundedAlertQueue(
+            maxsize=config.alert_queue_size,
+            policy=config.alert_overflow_policy,
+            spill_dir=config.alert_spill_dir,
+            segment_size=config.alert_spill_segment_size,
+            max_segments=config.alert_spill_max_segments
+        )
         self.recent_alerts = []  # Store recent alerts for UI
         self.max_recent_alerts = 10  # Maximum number of recent alerts to keep
+        self.cooldowns = {}  # (camera, type, subtype, zone, track) -> emission state
+        self._last_prune = time.monotonic()
         print("AlertSystem initialized with config:", self.config)
 
-    def generate_alert(self, alert_type: str, details: Dict):
-        """Generate and queue an alert"""
+    def generate_alert(self, alert_type: str, details: Dict, camera_id: Optional[str] = None) -> Optional[Dict]:
+        """
+        Generate and queue an alert
+
+        Repeats of the same (camera, type, subtype, zone, track) within the cooldown
+        window are only counted; the next alert emitted for that key carries
+        the number of occurrences it aggregates.
+
+        Returns:
+            The queued alert, or None if it was suppressed
+        """
         try:
+            occurrences = self._record_occurrence(alert_type, details, camera_id)
+            if occurrences is None:
+                return None
+
             print(f"Generating alert of type: {alert_type} with details: {details}")
             # Ensure details are JSON serializable
             serializable_details = {}
@@ -32,12 +67,16 @@ class AlertSystem:
             alert = {
                 'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
                 'type': alert_type,
+                'severity': self.severity(alert_type),
+                'camera_id': camera_id,
+                'count': occurrences,
                 'details': serializable_details
             }
             
-            self.alert_queue.put(alert)
+            if not self.bus.publish(alert):
+                self.alert_queue.put(alert)
             self.recent_alerts.append(alert)
-            print(f"Alert added to queue and recent alerts: {alert}")
+            print(f"Alert published and added to recent alerts: {alert}")
             
             # Keep only the most recent alerts
             if len(self.recent_alerts) > self.max_recent_alerts:
@@ -45,28 +84,64 @@ class AlertSystem:
                 print(f"Trimmed recent alerts list to the latest {self.max_recent_alerts} alerts.")
                 
             logger.info(f"Alert generated: {alert_type}")
+            return alert
             
         except Exception as e:
             logger.error(f"Error generating alert: {str(e)}")
             print(f"Error generating alert: {str(e)}")
+            return None
+
+    def severity(self, alert_type: str) -> str:
+        """Severity level for an alert type, configurable via alert_severities"""
+        return alert_severity(alert_type, self.config.alert_severities)
+
+    def _cooldown_key(self, alert_type: str, details: Dict, camera_id: Optional[str]) -> Tuple:
+        """Build the deduplication key for an alert"""
+        zone = details.get('zone')
+        location = details.get('location')
+        if zone is None and isinstance(location, (tuple, list)) and len(location) >= 2:
+            size = self.config.alert_zone_size
+            zone = (int(location[0] // size), int(location[1] // size))
+        if isinstance(zone, (list, dict)):
+            zone = str(zone)
+        track = details.get('track_id', details.get('name'))
+        if isinstance(track, list):
+            track = tuple(track)
+        # details['type'] is the anomaly/violation kind, e.g. sudden_movement
+        return (camera_id, alert_type, details.get('type'), zone, track)
+
+    def _record_occurrence(self, alert_type: str, details: Dict, camera_id: Optional[str]) -> Optional[int]:
+        """
+        Record an alert occurrence against its cooldown key
+
+        Returns:
+            None while the key is inside its cooldown window, otherwise the
+            number of occurrences since the last emitted alert (this one included)
+        """
+        now = time.monotonic()
+        key = self._cooldown_key(alert_type, details, camera_id)
+        window = (self.config.alert_cooldowns or {}).get(alert_type, self.config.alert_cooldown_seconds)
+
+        state = self.cooldowns.get(key)
+        if state and now - state['emitted_at'] < window:
+            state['suppressed'] += 1
+            return None
+
+        suppressed = state['suppressed'] if state else 0
+        self.cooldowns[key] = {'emitted_at': now, 'suppressed': 0}
+        self._prune_cooldowns(now)
+        return suppressed + 1
+
+    def _prune_cooldowns(self, now: float):
+        """Forget keys that have been quiet for longer than any cooldown window"""
+        if now - self._last_prune < self.config.alert_cooldown_seconds:
+            return
+        self._last_prune = now
+        longest = max([self.config.alert_cooldown_seconds, *(self.config.alert_cooldowns or {}).values()])
+        self.cooldowns = {key: state for key, state in self.cooldowns.items()
+                          if now - state['emitted_at'] < 2 * longest}
 
     def get_alerts(self) -> List[Dict]:
         """Get recent alerts for UI display"""
         print("Returning recent alerts:", self.recent_alerts)
         return self.recent_alerts.copy()  # Return a copy to prevent modification
-
-    async def send_alert(self, websocket: WebSocket):
-        """Send alert to connected client"""
-        while True:
-            if not self.alert_queue.empty():
-                try:
-                    alert = self.alert_queue.get()
-                    print(f"Sending alert: {alert}")
-                    # Ensure alert is JSON serializable
-                    json_alert = json.dumps(alert, default=str)
-                    await websocket.send_text(json_alert)
-                    print(f"Alert sent to client: {json_alert}")
-                except Exception as e:
-                    logger.error(f"Error sending alert: {str(e)}")
-                    print(f"Error sending alert: {str(e)}")
-            await asyncio.sleep(0.1)
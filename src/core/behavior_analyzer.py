@@ -23,7 +23,8 @@ class BehaviorAnalyzer:
                     anomalies.append({
                         'type': 'restricted_area_violation',
                         'location': center,
-                        'confidence': detection['confidence']
+                        'confidence': detection['confidence'],
+                        'track_id': detection.get('track_id')
                     })
         
         # Analyze movement patterns
@@ -36,7 +37,8 @@ class BehaviorAnalyzer:
                     anomalies.append({
                         'type': 'sudden_movement',
                         'location': (current_positions[i], detections[i]['bbox'][1]),
-                        'confidence': detections[i]['confidence']
+                        'confidence': detections[i]['confidence'],
+                        'track_id': detections[i].get('track_id')
                     })
                     
             self.movement_history = self.movement_history[-10:]
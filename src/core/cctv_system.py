@@ -1,5 +1,6 @@
 from config.config import SystemConfig
 from datetime import datetime
+from typing import Dict, List
 import logging
 from config.config import SystemConfig
 import yaml
@@ -8,12 +9,16 @@ from .crowd_analyzer import CrowdAnalyzer
 from .behavior_analyzer import BehaviorAnalyzer
 from .work_monitor import WorkMonitor
 from .alert_system import AlertSystem
+from .event_policy import EventLoggingPolicy
+from .metrics_state import MetricsState
 from ..database.handlers import DatabaseHandler
 from .video_stream import VideoStream
+from .frame_hub import FrameHub
 
 class CCTVSystem:
     """Main system class that coordinates all components"""
-    def __init__(self, config_path: str):
+    def __init__(self, config_path: str, metrics_state: MetricsState = None, hub: FrameHub = None,
+                 load_detector: bool = True):
         print(f"Loading configuration from {config_path}...")
         
         try:
@@ -27,14 +32,20 @@ class CCTVSystem:
             self.config = SystemConfig(**config_dict)
             
             self.video_streams = {}
-            self.person_detector = PersonDetector(self.config)
+            # The API app runs detection in worker processes instead
+            self.person_detector = PersonDetector(self.config) if load_detector else None
             self.crowd_analyzer = CrowdAnalyzer(self.config)
             self.behavior_analyzer = BehaviorAnalyzer(self.config)
             self.work_monitor = WorkMonitor(self.config)
             self.alert_system = AlertSystem(self.config)
+            self.event_policy = EventLoggingPolicy(self.config)
+            # Latest per-camera results for live dashboards
+            self.metrics_state = metrics_state or MetricsState()
+            self.frame_hub = hub or FrameHub()
             
             # Initialize database handler
             self.db_handler = DatabaseHandler(self.db_config)
+            self.db_handler.start_retention()
             print("CCTV System initialized successfully.")
             
         except FileNotFoundError:
@@ -47,7 +58,7 @@ class CCTVSystem:
     def add_camera(self, camera_id: str, source: str):
         """Add new camera stream"""
         print(f"Adding camera '{camera_id}' with source '{source}'...")
-        stream = VideoStream(source, self.config)
+        stream = VideoStream(source, self.config, camera_id, self.frame_hub)
         self.video_streams[camera_id] = stream
         stream.start()
         print(f"Camera '{camera_id}' added and stream started.")
@@ -64,40 +75,80 @@ class CCTVSystem:
         # Detect persons
         detections = self.person_detector.detect(frame)
         print(f"Detections: {len(detections)} persons detected.")
-        
+        self.analyze_frame(camera_id, frame, detections)
+
+    def analyze_frame(self, camera_id: str, frame, detections: List[Dict]):
+        """Run analysis, alerting and logging on a frame whose persons are already detected"""
         # Analyze crowd
-        crowd_analysis = self.crowd_analyzer.analyze_crowd(detections)
+        crowd_analysis = self.crowd_analyzer.analyze_crowd(detections, frame, camera_id)
         print(f"Crowd Density: {crowd_analysis['density']:.2f}")
+        # Track first: it sets each detection's track_id, which the alert cooldowns key on
+        events = self.event_policy.update(camera_id, detections, crowd_analysis)
+        # Rollups average every frame; raw crowd rows below are only written on events
+        self.db_handler.sample_crowd(crowd_analysis['density'], crowd_analysis['count'], camera_id)
         if crowd_analysis['density'] > self.config.max_crowd_density:
             print("High crowd density detected. Generating alert.")
-            self.alert_system.generate_alert('high_crowd_density', crowd_analysis)
+            self.alert_system.generate_alert('high_crowd_density', crowd_analysis, camera_id)
+        flow = crowd_analysis.get('flow')
+        if flow and flow['stampede']:
+            print("Stampede indicators detected. Generating alert.")
+            self.alert_system.generate_alert('stampede_risk', flow, camera_id)
+        elif flow and flow['counter_flow']:
+            print("Counter-flow detected. Generating alert.")
+            self.alert_system.generate_alert('counter_flow', {
+                'zones': flow['counter_flow_zones'],
+                'mean_speed': flow['mean_speed']
+            }, camera_id)
             
         # Analyze behavior
+        violations = []
         anomalies = self.behavior_analyzer.analyze_behavior(
             detections, self.config.restricted_areas)
         for anomaly in anomalies:
             print("Behavior anomaly detected. Generating alert.")
-            self.alert_system.generate_alert('behavior_anomaly', anomaly)
+            alert = self.alert_system.generate_alert('behavior_anomaly', anomaly, camera_id)
+            if alert:
+                self.db_handler.log_behavior_anomaly(anomaly['type'], anomaly['location'],
+                                                     alert['details'], camera_id, alert['count'])
             
         # Monitor workplace safety
         if self._is_working_hours():
             violations = self.work_monitor.monitor_safety(frame, detections)
             for violation in violations:
                 print("Safety violation detected. Generating alert.")
-                self.alert_system.generate_alert('safety_violation', violation)
+                alert = self.alert_system.generate_alert('safety_violation', violation, camera_id)
+                if alert:
+                    self.db_handler.log_safety_violation(violation['type'], violation['location'],
+                                                         alert['details'], camera_id, alert['count'])
                 
-        # Log events
-        for detection in detections:
-            self.db_handler.log_event('person_detected', detection, 
-                                    detection['confidence'])
-            print(f"Event logged for detection with confidence {detection['confidence']:.2f}.")
-            
+        # Log state changes rather than every detection on every frame
+        for event in events:
+            self.db_handler.log_event(event['type'], event['details'], event['confidence'])
+        # One crowd row per frame, even when count_change and keyframe coincide
+        if any(event['type'] in ('count_change', 'keyframe') for event in events):
+            self.db_handler.log_crowd_metrics(crowd_analysis['density'], crowd_analysis['count'],
+                                              crowd_analysis['hotspots'], camera_id)
+        if events:
+            print(f"Logged {len(events)} events for camera '{camera_id}'.")
+
+        self.frame_hub.annotate(camera_id, detections)
+        self.metrics_state.publish(camera_id, {
+            'crowd': crowd_analysis,
+            'violations': violations,
+            'behavior': anomalies
+        })
                                     
     def _is_working_hours(self) -> bool:
         """Check if current time is within working hours"""
         current_hour = datetime.now().hour
         return self.config.working_hours[0] <= current_hour <= self.config.working_hours[1]
         
+    def stop(self):
+        """Stop camera streams and flush pending database writes"""
+        for stream in self.video_streams.values():
+            stream.stop()
+        self.db_handler.close()
+
     def run(self):
         """Main processing loop"""
         print("Running CCTV system...")
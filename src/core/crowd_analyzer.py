@@ -1,43 +1,75 @@
 import numpy as np
 from sklearn.cluster import DBSCAN
-from typing import List, Dict
+from typing import List, Dict, Optional
 from config.config import SystemConfig
 from datetime import datetime
+from ..utils.spatial import bbox_centers, grid_cluster
+from .crowd_flow import CrowdFlowAnalyzer
 
 class CrowdAnalyzer:
     """Analyzes crowd density and movement patterns"""
     def __init__(self, config: SystemConfig):
         self.config = config
-        self.clustering = DBSCAN(eps=30, min_samples=3)
+        self.clustering = DBSCAN(eps=config.cluster_eps, min_samples=config.cluster_min_samples)
+        # Per-camera state: flow needs consecutive frames of the same camera,
+        # and clusters may only be reused for the same camera's points
+        self._cluster_cache = {}  # camera_id -> (points, clusters)
+        self.flow_analyzers = {}  # camera_id -> CrowdFlowAnalyzer
+        self.current_flow = None
+        self.density_counter = None
+        if config.enable_density_counting:
+            # torch is only needed for density counting, so import it on demand
+            try:
+                from .density_counter import DensityMapCounter
+            except ImportError as e:
+                print(f"Density counting disabled, torch unavailable: {e}")
+            else:
+                counter = DensityMapCounter(config)
+                self.density_counter = counter if counter.available else None
         self.current_analysis = {
             'density': 0.0,
             'hotspots': [],
             'count': 0,
+            'flow': None,
             'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         }
         print(f"CrowdAnalyzer initialized with config: {self.config}")
 
-    def analyze_crowd(self, detections: List[Dict]) -> Dict:
-        """Analyze crowd density and patterns"""
+    def analyze_crowd(self, detections: List[Dict], frame: Optional[np.ndarray] = None,
+                      camera_id: str = 'default') -> Dict:
+        """Analyze crowd density and patterns, plus motion flow when a frame is given"""
+        flow = None
+        if frame is not None and self.config.enable_crowd_flow:
+            if camera_id not in self.flow_analyzers:
+                self.flow_analyzers[camera_id] = CrowdFlowAnalyzer(self.config)
+            flow = self.flow_analyzers[camera_id].update(frame)
+            self.current_flow = flow
+
         if not detections:
             print("No detections received for analysis.")
             self.current_analysis = {
                 'density': 0.0,
                 'hotspots': [],
                 'count': 0,
+                'count_mode': 'detection',
+                'flow': flow,
                 'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             }
             print(f"Analysis result: {self.current_analysis}")
             return self.current_analysis
             
         print(f"Received {len(detections)} detections for analysis.")
+
+        # Dense scenes: one density-map pass replaces per-box clustering
+        if (self.density_counter and frame is not None
+                and len(detections) >= self.config.density_count_threshold):
+            return self._analyze_density_map(frame, flow)
         
-        points = np.array([[(d['bbox'][0] + d['bbox'][2])/2, 
-                           (d['bbox'][1] + d['bbox'][3])/2] for d in detections])
+        points = bbox_centers(detections)
         print(f"Calculated centroid points: {points}")
 
-        clusters = self.clustering.fit_predict(points)
-        print(f"DBSCAN clustering results: {clusters}")
+        clusters = self._cluster(points, camera_id)
+        print(f"{self.config.clustering_engine} clustering results: {clusters}")
 
         unique_clusters = np.unique(clusters[clusters != -1])
         print(f"Identified unique clusters (excluding noise): {unique_clusters}")
@@ -59,12 +91,52 @@ class CrowdAnalyzer:
             'density': density*1000000,
             'hotspots': hotspots,
             'count': len(detections),
+            'count_mode': 'detection',
+            'flow': flow,
             'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         }
         print(f"Analysis result: {self.current_analysis}")
 
         return self.current_analysis
     
+    def _analyze_density_map(self, frame: np.ndarray, flow: Optional[Dict]) -> Dict:
+        """Analyze a dense scene from a regressed density map"""
+        count, density_map = self.density_counter.estimate(frame)
+        print(f"Density map count estimate: {count:.1f}")
+
+        hotspots = self.density_counter.hotspots(density_map, frame.shape,
+                                                 self.config.density_hotspot_cell,
+                                                 self.config.cluster_min_samples)
+        density = float(count / (640 * 480))  # same normalization as detection mode
+
+        self.current_analysis = {
+            'density': density*1000000,
+            'hotspots': hotspots,
+            'count': int(round(count)),
+            'count_mode': 'density_map',
+            'flow': flow,
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+        print(f"Analysis result: {self.current_analysis}")
+
+        return self.current_analysis
+
+    def _cluster(self, points: np.ndarray, camera_id: str) -> np.ndarray:
+        """Cluster centroid points, reusing the camera's last result if they barely moved"""
+        last = self._cluster_cache.get(camera_id)
+        if (last is not None
+                and last[0].shape == points.shape
+                and np.abs(points - last[0]).max() <= self.config.cluster_reuse_tolerance):
+            return last[1]
+
+        if self.config.clustering_engine == 'dbscan':
+            clusters = self.clustering.fit_predict(points)
+        else:
+            clusters = grid_cluster(points, self.config.cluster_eps, self.config.cluster_min_samples)
+
+        self._cluster_cache[camera_id] = (points, clusters)
+        return clusters
+
     def get_current_analysis(self) -> Dict:
         """Return the most recent analysis results"""
         print(f"Returning current analysis: {self.current_analysis}")
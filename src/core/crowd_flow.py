@@ -0,0 +1,123 @@
+import cv2
+import numpy as np
+from typing import Dict, Optional
+from config.config import SystemConfig
+from datetime import datetime
+
+class CrowdFlowAnalyzer:
+    """Estimates crowd motion with dense optical flow on a downscaled frame"""
+    DIRECTION_BINS = 8
+    MAX_SCALE = 0.25
+
+    def __init__(self, config: SystemConfig):
+        self.config = config
+        self.scale = min(config.flow_scale, self.MAX_SCALE)
+        self.zone_rows, self.zone_cols = config.flow_zones
+        self._prev_gray = None
+        self._zone_ids = None
+        self._frames_since_prev = 0  # frames fed since _prev_gray was taken
+        self.current_flow = None
+
+    def update(self, frame: np.ndarray) -> Optional[Dict]:
+        """
+        Feed a frame and return the latest flow analysis
+
+        Flow is only computed every flow_interval frames; in between the
+        previous result is returned unchanged.
+        """
+        if self._prev_gray is not None:
+            self._frames_since_prev += 1
+            if self._frames_since_prev < self.config.flow_interval:
+                return self.current_flow
+
+        small = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_RGB2GRAY)
+
+        if self._prev_gray is None or self._prev_gray.shape != gray.shape:
+            self._prev_gray = gray
+            self._frames_since_prev = 0
+            self._zone_ids = self._build_zone_ids(gray.shape)
+            return self.current_flow
+
+        flow = cv2.calcOpticalFlowFarneback(self._prev_gray, gray, None,
+                                            0.5, 2, 9, 2, 5, 1.1, 0)
+        self._prev_gray = gray
+
+        # Express speed in full-resolution pixels per analysed frame
+        flow /= self.scale * self._frames_since_prev
+        self._frames_since_prev = 0
+        self.current_flow = self._summarize(flow)
+        return self.current_flow
+
+    def _build_zone_ids(self, shape) -> np.ndarray:
+        """Map every pixel of the small frame to its zone index"""
+        height, width = shape
+        rows = np.minimum(np.arange(height) * self.zone_rows // height, self.zone_rows - 1)
+        cols = np.minimum(np.arange(width) * self.zone_cols // width, self.zone_cols - 1)
+        return (rows[:, np.newaxis] * self.zone_cols + cols[np.newaxis, :]).ravel()
+
+    def _summarize(self, flow: np.ndarray) -> Dict:
+        """Aggregate a flow field into per-zone histograms and crowd indicators"""
+        magnitude, angle = cv2.cartToPolar(flow[..., 0], flow[..., 1])
+        magnitude = magnitude.ravel()
+        angle = angle.ravel()
+        zones = self.zone_rows * self.zone_cols
+        bins = self.DIRECTION_BINS
+
+        moving = magnitude > self.config.flow_min_speed
+        direction = (angle[moving] * (bins / (2 * np.pi))).astype(np.intp) % bins
+        moving_zones = self._zone_ids[moving]
+
+        histograms = np.bincount(moving_zones * bins + direction,
+                                 weights=magnitude[moving],
+                                 minlength=zones * bins).reshape(zones, bins)
+        pixels = np.bincount(self._zone_ids, minlength=zones)
+        moving_pixels = np.bincount(moving_zones, minlength=zones)
+        speed_sums = np.bincount(moving_zones, weights=magnitude[moving], minlength=zones)
+        zone_speed = speed_sums / np.maximum(moving_pixels, 1)
+        zone_coverage = moving_pixels / np.maximum(pixels, 1)
+
+        totals = histograms.sum(axis=1, keepdims=True)
+        normalized = histograms / np.where(totals > 0, totals, 1)
+        dominant = normalized.argmax(axis=1)
+        counter_flow = self._counter_flow(normalized, dominant, zone_coverage)
+
+        zone_results = []
+        for zone in range(zones):
+            active = zone_coverage[zone] >= self.config.flow_min_coverage
+            zone_results.append({
+                'zone': (zone // self.zone_cols, zone % self.zone_cols),
+                'mean_speed': float(zone_speed[zone]),
+                'coverage': float(zone_coverage[zone]),
+                'direction_histogram': normalized[zone].round(3).tolist(),
+                'dominant_direction': float(dominant[zone] * 360 / bins) if active else None,
+                'counter_flow': bool(counter_flow[zone])
+            })
+
+        coverage = float(np.count_nonzero(moving) / len(magnitude))
+        mean_speed = float(magnitude[moving].mean()) if coverage > 0 else 0.0
+        stampede = (mean_speed >= self.config.stampede_speed
+                    and coverage >= self.config.stampede_min_coverage)
+
+        return {
+            'mean_speed': mean_speed,
+            'coverage': coverage,
+            'zones': zone_results,
+            'counter_flow': bool(counter_flow.any()),
+            'counter_flow_zones': [z['zone'] for z in zone_results if z['counter_flow']],
+            'stampede': bool(stampede),
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+    def _counter_flow(self, normalized: np.ndarray, dominant: np.ndarray,
+                      coverage: np.ndarray) -> np.ndarray:
+        """Flag zones where a large share of motion opposes the dominant direction"""
+        bins = self.DIRECTION_BINS
+        rows = np.arange(len(normalized))[:, np.newaxis]
+        spread = np.array([-1, 0, 1])
+        forward = normalized[rows, (dominant[:, np.newaxis] + spread) % bins].sum(axis=1)
+        opposite = dominant[:, np.newaxis] + bins // 2 + spread
+        backward = normalized[rows, opposite % bins].sum(axis=1)
+        return ((coverage >= self.config.flow_min_coverage)
+                & (backward >= self.config.counter_flow_ratio * forward)
+                & (backward > 0))
@@ -0,0 +1,106 @@
+import logging
+import os
+import cv2
+import numpy as np
+import torch
+from torch import nn
+from typing import Dict, List, Tuple
+from config.config import SystemConfig
+
+class CSRNetLite(nn.Module):
+    """Small CSRNet-style density regressor: VGG-like frontend, dilated backend"""
+    def __init__(self):
+        super().__init__()
+
+        def conv(in_channels, out_channels, dilation=1):
+            return [nn.Conv2d(in_channels, out_channels, 3, padding=dilation, dilation=dilation),
+                    nn.ReLU(inplace=True)]
+
+        self.frontend = nn.Sequential(
+            *conv(3, 32), *conv(32, 32), nn.MaxPool2d(2),
+            *conv(32, 64), *conv(64, 64), nn.MaxPool2d(2),
+            *conv(64, 128), *conv(128, 128), nn.MaxPool2d(2)
+        )
+        self.backend = nn.Sequential(
+            *conv(128, 128, dilation=2), *conv(128, 64, dilation=2), *conv(64, 32, dilation=2)
+        )
+        self.output = nn.Conv2d(32, 1, 1)
+
+    def forward(self, x):
+        return self.output(self.backend(self.frontend(x)))
+
+class DensityMapCounter:
+    """Counts people in dense scenes by regressing a density map on CPU"""
+    OUTPUT_STRIDE = 8
+    MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+    STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+    def __init__(self, config: SystemConfig):
+        self.config = config
+        self.model = None
+        if not os.path.isfile(config.density_model_path):
+            # An untrained network would report arbitrary counts, so stay off
+            logging.warning(f"Density model weights not found at {config.density_model_path}. "
+                            "Running without density counting.")
+            return
+        try:
+            model = CSRNetLite()
+            model.load_state_dict(torch.load(config.density_model_path,
+                                             map_location='cpu', weights_only=True))
+            model.eval()
+            self.model = model
+            print(f"Density map model loaded from {config.density_model_path}.")
+        except Exception as e:
+            logging.warning(f"Density model not loaded: {e}. Running without density counting.")
+
+    @property
+    def available(self) -> bool:
+        return self.model is not None
+
+    def estimate(self, frame: np.ndarray) -> Tuple[float, np.ndarray]:
+        """
+        Estimate the person count of an RGB frame
+
+        Returns:
+            Tuple of (count, density_map) where the map covers the frame at
+            1/8 of the model input resolution
+        """
+        height, width = frame.shape[:2]
+        input_width = min(self.config.density_input_width, width)
+        input_height = max(int(round(height * input_width / width)), self.OUTPUT_STRIDE)
+        resized = cv2.resize(frame, (input_width, input_height), interpolation=cv2.INTER_AREA)
+
+        image = (resized.astype(np.float32) / 255.0 - self.MEAN) / self.STD
+        tensor = torch.from_numpy(image.transpose(2, 0, 1)).unsqueeze(0)
+        with torch.inference_mode():
+            density_map = self.model(tensor)[0, 0].numpy()
+
+        density_map = np.maximum(density_map, 0)
+        return float(density_map.sum()), density_map
+
+    def hotspots(self, density_map: np.ndarray, frame_shape: Tuple[int, int],
+                 cell_size: float, min_size: int) -> List[Dict]:
+        """Group density mass into grid cells of cell_size frame pixels"""
+        height, width = frame_shape[:2]
+        map_height, map_width = density_map.shape
+        scale_y, scale_x = height / map_height, width / map_width
+        cell = max(int(round(cell_size / scale_x)), 1)
+
+        rows, cols = -(-map_height // cell), -(-map_width // cell)
+        padded = np.zeros((rows * cell, cols * cell), dtype=density_map.dtype)
+        padded[:map_height, :map_width] = density_map
+        blocks = padded.reshape(rows, cell, cols, cell)
+        mass = blocks.sum(axis=(1, 3))
+
+        ys = (np.arange(rows * cell) + 0.5) * scale_y
+        xs = (np.arange(cols * cell) + 0.5) * scale_x
+        weighted_y = (padded * ys[:, np.newaxis]).reshape(rows, cell, cols, cell).sum(axis=(1, 3))
+        weighted_x = (padded * xs[np.newaxis, :]).reshape(rows, cell, cols, cell).sum(axis=(1, 3))
+
+        hotspots = []
+        for r, c in zip(*np.nonzero(mass >= min_size)):
+            hotspots.append({
+                'center': (int(weighted_x[r, c] / mass[r, c]), int(weighted_y[r, c] / mass[r, c])),
+                'size': int(round(float(mass[r, c])))
+            })
+        return hotspots
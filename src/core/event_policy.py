@@ -0,0 +1,135 @@
+import time
+import cv2
+import numpy as np
+from typing import Dict, List, Optional
+from config.config import SystemConfig
+from ..utils.spatial import bbox_centers
+
+UNKNOWN_NAMES = (None, 'Unknown')
+
+class EventLoggingPolicy:
+    """
+    Turns per-frame detections into state-transition events worth storing
+
+    Detections are linked into tracks by nearest-centroid matching. Events
+    are only produced when something changes: a track starts or ends, an
+    identity is resolved, a track enters or leaves a zone, or the person
+    count moves by at least event_count_delta. A keyframe summary is
+    produced every event_keyframe_interval seconds to cover the rest.
+    """
+    def __init__(self, config: SystemConfig):
+        self.config = config
+        self.zones = [np.asarray(area, dtype=np.float32) for area in (config.restricted_areas or [])]
+        self.cameras = {}
+        self._next_track_id = 1
+
+    def update(self, camera_id: str, detections: List[Dict], crowd_analysis: Optional[Dict] = None,
+               now: Optional[float] = None) -> List[Dict]:
+        """
+        Feed one frame's detections and return the events it produces
+
+        Matched detections are annotated in place with a 'track_id'.
+        """
+        now = time.monotonic() if now is None else now
+        state = self.cameras.setdefault(camera_id, {
+            'tracks': {},
+            'logged_count': None,
+            'last_keyframe': None
+        })
+        tracks = state['tracks']
+        events = []
+
+        centers = bbox_centers(detections)
+        assignments = self._match(tracks, centers)
+
+        for index, detection in enumerate(detections):
+            center = (float(centers[index][0]), float(centers[index][1]))
+            track_id = assignments.get(index)
+            if track_id is None:
+                track_id = self._next_track_id
+                self._next_track_id += 1
+                tracks[track_id] = {'started': now, 'name': detection.get('name'), 'zones': set()}
+                events.append(self._event('track_start', camera_id, detection, track_id, center))
+            track = tracks[track_id]
+            track.update(center=center, last_seen=now, confidence=detection.get('confidence'))
+            detection['track_id'] = track_id
+
+            name = detection.get('name')
+            if track['name'] in UNKNOWN_NAMES and name not in UNKNOWN_NAMES:
+                track['name'] = name
+                events.append(self._event('identity_resolved', camera_id, detection, track_id, center))
+
+            zones = {i for i, zone in enumerate(self.zones)
+                     if cv2.pointPolygonTest(zone, center, False) >= 0}
+            for zone in sorted(zones - track['zones']):
+                events.append(self._event('zone_enter', camera_id, detection, track_id, center, zone=zone))
+            for zone in sorted(track['zones'] - zones):
+                events.append(self._event('zone_exit', camera_id, detection, track_id, center, zone=zone))
+            track['zones'] = zones
+
+        for track_id in [t for t, track in tracks.items() if now - track['last_seen'] > self.config.track_timeout]:
+            track = tracks.pop(track_id)
+            events.append({
+                'type': 'track_end',
+                'details': {
+                    'camera_id': camera_id,
+                    'track_id': track_id,
+                    'name': track['name'],
+                    'location': track['center'],
+                    'duration': round(track['last_seen'] - track['started'], 2)
+                },
+                'confidence': track['confidence']
+            })
+
+        count = len(detections) if crowd_analysis is None else crowd_analysis.get('count', len(detections))
+        summary = {
+            'camera_id': camera_id,
+            'count': count,
+            'tracks': sorted(tracks),
+            'density': crowd_analysis.get('density') if crowd_analysis else None,
+            'hotspots': crowd_analysis.get('hotspots') if crowd_analysis else None
+        }
+        if state['logged_count'] is None or abs(count - state['logged_count']) >= self.config.event_count_delta:
+            events.append({'type': 'count_change',
+                           'details': {**summary, 'previous_count': state['logged_count']},
+                           'confidence': None})
+            state['logged_count'] = count
+        if state['last_keyframe'] is None or now - state['last_keyframe'] >= self.config.event_keyframe_interval:
+            events.append({'type': 'keyframe', 'details': summary, 'confidence': None})
+            state['last_keyframe'] = now
+
+        return events
+
+    def _match(self, tracks: Dict, centers: np.ndarray) -> Dict[int, int]:
+        """Greedily pair detections with the nearest live track"""
+        if not tracks or len(centers) == 0:
+            return {}
+        track_ids = list(tracks)
+        track_centers = np.array([tracks[t]['center'] for t in track_ids])
+        distances = np.linalg.norm(centers[:, np.newaxis, :] - track_centers[np.newaxis, :, :], axis=2)
+
+        assignments, used_tracks = {}, set()
+        for flat in np.argsort(distances, axis=None):
+            detection_index, track_index = divmod(int(flat), len(track_ids))
+            if distances[detection_index, track_index] > self.config.track_max_distance:
+                break
+            if detection_index in assignments or track_index in used_tracks:
+                continue
+            assignments[detection_index] = track_ids[track_index]
+            used_tracks.add(track_index)
+        return assignments
+
+    @staticmethod
+    def _event(event_type: str, camera_id: str, detection: Dict, track_id: int, center, **extra) -> Dict:
+        return {
+            'type': event_type,
+            'details': {
+                'camera_id': camera_id,
+                'track_id': track_id,
+                'name': detection.get('name'),
+                'location': center,
+                'bbox': detection.get('bbox'),
+                **extra
+            },
+            'confidence': detection.get('confidence')
+        }
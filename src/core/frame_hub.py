@@ -0,0 +1,141 @@
+import threading
+import time
+import cv2
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from ..utils.notify import ChangeNotifier
+
+# name -> JPEG quality and maximum width (None keeps the source size)
+DEFAULT_PROFILES = {
+    'full': {'quality': 80, 'width': None},
+    'preview': {'quality': 70, 'width': 640},
+    'thumbnail': {'quality': 60, 'width': 160}
+}
+
+def draw_detections(frame: np.ndarray, detections: List[Dict]) -> np.ndarray:
+    """Copy of an RGB frame with detection boxes and labels drawn on it"""
+    annotated = frame.copy()
+    for detection in detections:
+        x1, y1, x2, y2 = (int(v) for v in detection['bbox'][:4])
+        cv2.rectangle(annotated, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        label = str(detection.get('name') or 'person')
+        if detection.get('track_id') is not None:
+            label += f" #{detection['track_id']}"
+        cv2.putText(annotated, label, (x1, max(12, y1 - 5)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+    return annotated
+
+def encode_jpeg(frame: np.ndarray, quality: int, width: Optional[int] = None) -> bytes:
+    """Encode an RGB frame as JPEG, downscaling to width if it is wider"""
+    if width and frame.shape[1] > width:
+        height = max(1, round(frame.shape[0] * width / frame.shape[1]))
+        frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+    ok, buffer = cv2.imencode('.jpg', cv2.cvtColor(frame, cv2.COLOR_RGB2BGR),
+                              [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("JPEG encoding failed")
+    return buffer.tobytes()
+
+class FrameHub:
+    """
+    Latest frame per camera, shared by every viewer
+
+    Capture threads publish frames here; viewers wait for a newer sequence
+    number and always get the most recent frame, so a slow viewer skips
+    frames instead of building up a backlog. Frames are RGB, as produced
+    by preprocess_frame.
+
+    Analysis runs on fewer frames than are captured, so its detections are
+    kept as an overlay; each published frame records the overlay current at
+    that moment, and the annotated view of a frame is that overlay drawn on
+    it. Raw and annotated views therefore share one sequence number.
+
+    JPEGs are encoded at most once per source frame and profile and shared
+    by every stream, snapshot and thumbnail that asks for them, so encode
+    cost does not grow with the number of viewers.
+    """
+    def __init__(self, profiles: Optional[Dict[str, Dict]] = None):
+        self.profiles = profiles or DEFAULT_PROFILES
+        self.encodes = 0
+        self._frames = {}  # camera_id -> (seq, timestamp, frame, overlay detections or None)
+        self._notifiers = {}  # camera_id -> ChangeNotifier
+        self._overlays = {}  # camera_id -> detections of the last analysed frame
+        self._encoded = {}  # (camera_id, profile, annotated) -> (seq, timestamp, jpeg)
+        self._encode_locks = {}  # (camera_id, profile, annotated) -> Lock
+        self._lock = threading.Lock()
+
+    def _notifier(self, camera_id: str) -> ChangeNotifier:
+        with self._lock:
+            return self._notifiers.setdefault(camera_id, ChangeNotifier())
+
+    def publish(self, camera_id: str, frame: np.ndarray) -> int:
+        """Store a new frame for camera_id from any thread and return its sequence number"""
+        with self._lock:
+            seq = self._frames[camera_id][0] + 1 if camera_id in self._frames else 1
+            self._frames[camera_id] = (seq, time.time(), frame, self._overlays.get(camera_id))
+        self._notifier(camera_id).notify()
+        return seq
+
+    def annotate(self, camera_id: str, detections: List[Dict]):
+        """Set the detections drawn on frames published from now on"""
+        with self._lock:
+            self._overlays[camera_id] = list(detections)
+
+    def _entry(self, camera_id: str, annotated: bool) -> Optional[Tuple]:
+        entry = self._frames.get(camera_id)
+        if entry is None or (annotated and entry[3] is None):
+            return None
+        return entry
+
+    def latest(self, camera_id: str, annotated: bool = False) -> Optional[Tuple[int, float, np.ndarray]]:
+        """Return (seq, timestamp, frame) for the newest frame, or None (annotated: until analysis ran)"""
+        with self._lock:
+            entry = self._entry(camera_id, annotated)
+            return entry[:3] if entry else None
+
+    def cameras(self) -> List[str]:
+        with self._lock:
+            return list(self._frames)
+
+    def has_camera(self, camera_id: str) -> bool:
+        with self._lock:
+            return camera_id in self._frames
+
+    async def next_frame(self, camera_id: str, after_seq: int = 0) -> Tuple[int, float, np.ndarray]:
+        """Wait for a frame newer than after_seq"""
+        def newer():
+            entry = self.latest(camera_id)
+            return entry is not None and entry[0] > after_seq
+        await self._notifier(camera_id).wait_for(newer)
+        return self.latest(camera_id)
+
+    def jpeg(self, camera_id: str, profile: str = 'full', annotated: bool = False) -> Optional[Tuple[int, float, bytes]]:
+        """
+        Return (seq, timestamp, jpeg) for the newest frame in the given profile
+
+        seq and timestamp belong to the frame the bytes were encoded from, so
+        callers can label the response without a second, racing lookup.
+
+        With annotated=True the frame's overlay is drawn on it, and None is
+        returned until the camera has been analysed. Blocking; call from a
+        worker thread. Concurrent callers for the same camera and profile
+        wait for one encode instead of repeating it.
+        """
+        settings = self.profiles[profile]
+        key = (camera_id, profile, annotated)
+        with self._lock:
+            lock = self._encode_locks.setdefault(key, threading.Lock())
+        with lock:
+            with self._lock:
+                entry = self._entry(camera_id, annotated)
+            if entry is None:
+                return None
+            seq, timestamp, frame = entry[:3]
+            cached = self._encoded.get(key)
+            if cached is not None and cached[0] == seq:
+                return cached
+            if annotated:
+                frame = draw_detections(frame, entry[3])
+            encoded = (seq, timestamp, encode_jpeg(frame, settings['quality'], settings.get('width')))
+            self._encoded[key] = encoded
+            self.encodes += 1
+            return encoded
@@ -0,0 +1,41 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+from typing import Dict, List
+import numpy as np
+from config.config import SystemConfig
+from ..utils.logging_setup import logger
+
+# Per worker process, loaded once by the pool initializer
+_detector = None
+
+def _load_detector(config: Dict):
+    global _detector
+    from .person_detector import PersonDetector
+    _detector = PersonDetector(SystemConfig(**config))
+
+def _detect(frame: np.ndarray) -> List[Dict]:
+    return _detector.detect(frame)
+
+class InferencePool:
+    """
+    Person detection in separate worker processes
+
+    Each worker loads the detector models once at startup, so inference
+    neither holds the GIL of the API process nor blocks its event loop,
+    and several cameras can be processed in parallel.
+    """
+    def __init__(self, config: SystemConfig, workers: int = 1):
+        # spawn: forking a process that already initialized torch/CUDA is unsafe
+        context = multiprocessing.get_context('spawn')
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                            initializer=_load_detector, initargs=(asdict(config),))
+        logger.info(f"Started inference pool with {workers} worker(s)")
+
+    async def detect(self, frame: np.ndarray) -> List[Dict]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, _detect, frame)
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
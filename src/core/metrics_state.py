@@ -0,0 +1,296 @@
+import asyncio
+import json
+import threading
+import time
+from typing import Dict, List, Optional, Tuple, Union
+from ..utils.logging_setup import logger
+from ..utils.notify import ChangeNotifier
+
+def _json_default(value):
+    """Make numpy scalars/arrays and datetimes serializable"""
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return str(value)
+
+class MetricsState:
+    """
+    Latest analysis results per camera, kept in memory
+
+    The processing loop publishes here from its own thread; websocket
+    handlers read the snapshot and wait for the version to move instead
+    of querying the database.
+    """
+    def __init__(self):
+        self.version = 0
+        self._cameras = {}
+        self._lock = threading.Lock()
+        self._notifier = ChangeNotifier()
+
+    def publish(self, camera_id: str, sections: Dict):
+        """Replace the given sections (crowd, violations, behavior, ...) for a camera"""
+        # Normalize once here so every reader gets plain JSON types
+        sections = json.loads(json.dumps(sections, default=_json_default))
+        with self._lock:
+            camera = self._cameras.setdefault(camera_id, {})
+            camera.update(sections)
+            camera['updated'] = time.time()
+            self.version += 1
+            camera['version'] = self.version
+        self._notifier.notify()
+
+    def snapshot(self) -> Tuple[int, Dict]:
+        """Return (version, {camera_id: sections}) as of now"""
+        with self._lock:
+            return self.version, {camera_id: dict(camera) for camera_id, camera in self._cameras.items()}
+
+    def camera(self, camera_id: str) -> Optional[Dict]:
+        """Latest sections for one camera (including its 'version'), or None"""
+        with self._lock:
+            camera = self._cameras.get(camera_id)
+            return dict(camera) if camera is not None else None
+
+    async def wait_for_change(self, version: int):
+        """Wait until the state has moved past version"""
+        await self._notifier.wait_for(lambda: self.version != version)
+
+TOPIC_KINDS = ('crowd', 'violations', 'behavior', 'alerts')
+
+class Topics:
+    """
+    What a metrics client is subscribed to
+
+    Each dimension (cameras, kinds, alert severities) is either None,
+    meaning everything, or a frozenset. Instances are immutable and
+    hashable, so clients with identical subscriptions share one key.
+    """
+    def __init__(self, cameras=None, kinds=None, severities=None):
+        self.cameras = frozenset(cameras) if cameras is not None else None
+        self.kinds = frozenset(kinds) if kinds is not None else None
+        self.severities = frozenset(severities) if severities is not None else None
+
+    @property
+    def key(self) -> Tuple:
+        return (self.cameras, self.kinds, self.severities)
+
+    def __eq__(self, other):
+        return isinstance(other, Topics) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def subscribe(self, request: Dict) -> 'Topics':
+        """Add the cameras/kinds/severities listed in request"""
+        def merge(current, added):
+            if added is None:
+                return current
+            return frozenset(added) if current is None else current | frozenset(added)
+        return Topics(merge(self.cameras, request.get('cameras')),
+                      merge(self.kinds, request.get('kinds')),
+                      merge(self.severities, request.get('severities')))
+
+    def unsubscribe(self, request: Dict, known_cameras, known_severities) -> 'Topics':
+        """Remove the listed topics; 'everything' is expanded to the known values first"""
+        def remove(current, removed, universe):
+            if removed is None:
+                return current
+            return (frozenset(universe) if current is None else current) - frozenset(removed)
+        return Topics(remove(self.cameras, request.get('cameras'), known_cameras),
+                      remove(self.kinds, request.get('kinds'), TOPIC_KINDS),
+                      remove(self.severities, request.get('severities'), known_severities))
+
+    def select(self, cameras: Dict) -> Dict:
+        """Filter a snapshot down to the subscribed cameras and metric kinds"""
+        selected = {}
+        for camera_id, sections in cameras.items():
+            if self.cameras is not None and camera_id not in self.cameras:
+                continue
+            selected[camera_id] = {kind: value for kind, value in sections.items()
+                                   if kind in ('updated', 'version') or self.kinds is None or kind in self.kinds}
+        return selected
+
+    def matches_alert(self, alert: Dict) -> bool:
+        if self.kinds is not None and 'alerts' not in self.kinds:
+            return False
+        if self.cameras is not None and alert.get('camera_id') not in self.cameras:
+            return False
+        if self.severities is not None and alert.get('severity') not in self.severities:
+            return False
+        return True
+
+    def to_dict(self) -> Dict:
+        return {name: sorted(value) if value is not None else None
+                for name, value in zip(('cameras', 'kinds', 'severities'), self.key)}
+
+class MetricsBroadcaster:
+    """
+    Single task that pushes metrics and alerts to subscribed clients
+
+    Clients are grouped by their Topics; each group's message is built and
+    serialized once and shared by every client in it, and a group is only
+    sent anything when one of its cameras changed. Updates that arrive
+    faster than min_interval are coalesced, so clients receive at most one
+    metrics message per interval carrying the latest state.
+
+    Clients that connected with a DeltaSession get metrics encoded per
+    client as deltas against their last acknowledged snapshot instead of
+    the shared JSON text; alerts are plain JSON for everyone.
+
+    The alert subscription only accepts alerts some connected client's
+    topics match, so the bus reports everything else as undelivered and
+    the alert system keeps it in its backlog; replay() hands that backlog
+    to clients when they connect.
+    """
+    def __init__(self, state: MetricsState, manager, min_interval: float = 0.1):
+        self.state = state
+        self.manager = manager
+        self.min_interval = min_interval
+        self.alert_bus = None
+        self.alert_backlog = None
+        self.subscriptions: Dict = {}  # websocket -> Topics
+        self.sessions: Dict = {}  # websocket -> DeltaSession, for ?protocol=delta clients
+        self._alert_topics = ()  # Topics of connected clients, read by the publishing thread
+        self._sent = {}  # Topics -> update times of the cameras last sent
+        self._task: Optional[asyncio.Task] = None
+        self._alert_task: Optional[asyncio.Task] = None
+
+    def attach_alerts(self, alert_bus, backlog=None):
+        """Forward alerts from an AlertBus to clients subscribed to them, replaying backlog on connect"""
+        self.alert_bus = alert_bus
+        self.alert_backlog = backlog
+
+    def topics(self, websocket) -> Topics:
+        return self.subscriptions.get(websocket, Topics())
+
+    def add(self, websocket, session=None):
+        """Register a connected client with the default (everything) topics"""
+        if session is not None:
+            self.sessions[websocket] = session
+        self.set_topics(websocket, self.topics(websocket))
+
+    def set_topics(self, websocket, topics: Topics):
+        self.subscriptions[websocket] = topics
+        self._refresh_alert_topics()
+
+    def remove(self, websocket):
+        self.subscriptions.pop(websocket, None)
+        self.sessions.pop(websocket, None)
+        self._refresh_alert_topics()
+
+    def _refresh_alert_topics(self):
+        # Replaced whole so the publishing thread never iterates a changing dict
+        self._alert_topics = tuple(set(self.subscriptions.values()))
+
+    def _wants_alert(self, alert: Dict) -> bool:
+        return any(topics.matches_alert(alert) for topics in self._alert_topics)
+
+    async def replay(self, websocket, chunk: int = 50):
+        """
+        Deliver the backlogged alerts matching a client's topics
+
+        Alerts are taken chunk at a time and sent through the client's
+        alert lane one by one, each confirmed as written, so neither side
+        holds the whole backlog. Whatever was not written when the client
+        goes away goes back to the front of the backlog.
+        """
+        if self.alert_backlog is None:
+            return
+        topics = self.topics(websocket)
+        while True:
+            alerts = self.alert_backlog.take(topics.matches_alert, chunk)
+            if not alerts:
+                return
+            for index, alert in enumerate(alerts):
+                text = json.dumps({'type': 'alert', 'alert': alert}, default=str)
+                if not await self.manager.put_alert(websocket, text):
+                    self.alert_backlog.restore(alerts[index:])
+                    return
+
+    def current(self, websocket) -> Optional[Union[str, bytes]]:
+        """
+        Encoded current state for one client's topics, or None if empty
+
+        Used when a client connects or changes its subscription; the group's
+        last-sent state is seeded so the broadcaster does not resend it.
+        """
+        version, cameras = self.state.snapshot()
+        topics = self.topics(websocket)
+        selected = topics.select(cameras)
+        if not selected:
+            return None
+        self._sent.setdefault(topics, self._signature(selected))
+        message = {'type': 'metrics', 'version': version, 'cameras': selected}
+        session = self.sessions.get(websocket)
+        return session.encode(message) if session is not None else json.dumps(message)
+
+    @staticmethod
+    def _signature(selected: Dict) -> Dict:
+        return {camera_id: sections.get('updated') for camera_id, sections in selected.items()}
+
+    def start(self):
+        """Start the broadcast tasks on the running loop if they are not running yet"""
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+        if self.alert_bus is not None and (self._alert_task is None or self._alert_task.done()):
+            self._alert_task = loop.create_task(self._run_alerts())
+
+    async def stop(self):
+        for task in (self._task, self._alert_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = self._alert_task = None
+
+    def _groups(self) -> Dict[Topics, List]:
+        groups = {}
+        for websocket in self.manager.active_connections:
+            groups.setdefault(self.topics(websocket), []).append(websocket)
+        return groups
+
+    async def _run(self):
+        version = self.state.version
+        while True:
+            await self.state.wait_for_change(version)
+            version, cameras = self.state.snapshot()
+            try:
+                self._fan_out(version, cameras)
+            except Exception as e:
+                logger.error(f"Metrics broadcast error: {e}")
+            await asyncio.sleep(self.min_interval)
+
+    def _fan_out(self, version: int, cameras: Dict):
+        groups = self._groups()
+        self._sent = {topics: sent for topics, sent in self._sent.items() if topics in groups}
+        for topics, websockets in groups.items():
+            selected = topics.select(cameras)
+            signature = self._signature(selected)
+            if not selected or self._sent.get(topics) == signature:
+                continue
+            self._sent[topics] = signature
+            message = {'type': 'metrics', 'version': version, 'cameras': selected}
+            text = None
+            for websocket in websockets:
+                session = self.sessions.get(websocket)
+                if session is not None:
+                    self.manager.send(websocket, session.encode(message))
+                    continue
+                text = text or json.dumps(message)
+                self.manager.send(websocket, text)
+
+    async def _run_alerts(self):
+        subscription = self.alert_bus.subscribe(predicate=self._wants_alert)
+        try:
+            async for alert in subscription:
+                text = None
+                for topics, websockets in self._groups().items():
+                    if not topics.matches_alert(alert):
+                        continue
+                    # Alerts are serialized once, whichever groups receive them
+                    text = text or json.dumps({'type': 'alert', 'alert': alert}, default=str)
+                    for websocket in websockets:
+                        self.manager.send_alert(websocket, text)
+        finally:
+            self.alert_bus.unsubscribe(subscription)
@@ -5,13 +5,17 @@ import threading
 import cv2
 from ..utils.preprocessing import preprocess_frame
 from config.config import SystemConfig
+from .frame_hub import FrameHub
 import datetime
 
 class VideoStream:
     """Handles video stream capture and preprocessing"""
-    def __init__(self, source: str, config: SystemConfig):
+    def __init__(self, source: str, config: SystemConfig, camera_id: str = None, hub: FrameHub = None):
         self.source = source
         self.config = config
+        self.camera_id = camera_id
+        # Viewers read frames from the hub so they never compete with processing for the queue
+        self.hub = hub
         self.capture = cv2.VideoCapture(source)
         
         # Check if camera opened successfully
@@ -54,9 +58,13 @@ class VideoStream:
                     
                 consecutive_failures = 0
                 
-                # Only process every Nth frame
+                processed_frame = preprocess_frame(frame)
+                # Viewers get every frame; analysis paces itself by frame_skip
+                if processed_frame is not None and self.hub is not None:
+                    self.hub.publish(self.camera_id, processed_frame)
+
+                # Only queue every Nth frame
                 if frame_count % self.config.frame_skip == 0:
-                    processed_frame = preprocess_frame(frame)
                     if processed_frame is not None and not self.frame_queue.full():
                         # Clear queue if full
                         while self.frame_queue.full():
@@ -4,14 +4,19 @@ from ..utils.logging_setup import logger
 import cv2
 import logging
 import numpy as np
+from itertools import groupby
 from config.config import SystemConfig
 import tensorflow as tf 
 from typing import List, Dict, Tuple
+from ..utils.spatial import bbox_centers, find_close_pairs
 class WorkMonitor:
     """Monitors workplace safety and efficiency"""
+    POSE_INPUT_SIZE = (224, 224)
+
     def __init__(self, config: SystemConfig):
         self.config = config
         self.pose_model = None
+        self._pose_batch = np.empty((0, *self.POSE_INPUT_SIZE[::-1], 3), dtype=np.uint8)
         if config.enable_pose_detection:
             try:
                 self.pose_model = tf.keras.models.load_model('models/pose_model.h5')
@@ -20,50 +25,114 @@ class WorkMonitor:
                 
     def monitor_safety(self, frame: np.ndarray, detections: List[Dict]) -> List[Dict]:
         """Monitor workplace safety violations"""
-        violations = []
-        
+        return self.monitor_safety_batch([(frame, detections)])[0]
+
+    def monitor_safety_batch(self, items: List[Tuple[np.ndarray, List[Dict]]]) -> List[List[Dict]]:
+        """
+        Monitor safety for several frames at once, e.g. one per camera
+
+        With pose detection enabled, every person ROI across all frames is
+        sent through the pose model in a single batched call. If that call
+        fails, frames are retried one by one and a frame that still fails
+        gets proximity checks, so one bad frame does not blank the others.
+
+        Args:
+            items: List of (frame, detections) pairs
+
+        Returns:
+            List of violation lists, one per input pair
+        """
         if not self.pose_model:
             # Basic safety monitoring without pose detection
-            for detection in detections:
-                # Simple proximity-based violations
+            return [self._proximity_violations(detections) for _, detections in items]
+
+        # Full pose-based safety monitoring
+        results = [[] for _ in items]
+        owners = self._fill_pose_batch(items)
+        if not owners:
+            return results
+
+        try:
+            poses = self.pose_model.predict_on_batch(self._pose_batch[:len(owners)])
+        except Exception as e:
+            logging.warning(f"Error in batched pose detection, retrying per frame: {e}")
+            poses = self._predict_per_item(items, owners, results)
+
+        for (item_index, detection), pose in zip(owners, poses):
+            if pose is not None and self._is_unsafe_pose(pose):
                 bbox = detection['bbox']
-                for other in detections:
-                    if other != detection:
-                        if self._check_proximity(bbox, other['bbox']):
-                            violations.append({
-                                'type': 'proximity_violation',
-                                'location': ((bbox[0] + bbox[2])/2, (bbox[1] + bbox[3])/2),
-                                'confidence': detection['confidence']
-                            })
-        else:
-            # Full pose-based safety monitoring
+                results[item_index].append({
+                    'type': 'unsafe_pose',
+                    'location': ((bbox[0] + bbox[2])/2, (bbox[1] + bbox[3])/2),
+                    'confidence': detection['confidence'],
+                    'track_id': detection.get('track_id')
+                })
+        return results
+
+    def _predict_per_item(self, items: List[Tuple[np.ndarray, List[Dict]]], owners: List[Tuple[int, Dict]],
+                          results: List[List[Dict]]) -> List:
+        """Pose predictions frame by frame; failed frames get None poses and proximity violations"""
+        poses = [None] * len(owners)
+        start = 0
+        # owners are grouped by frame, in input order
+        for item_index, group in groupby(owners, key=lambda owner: owner[0]):
+            end = start + len(list(group))
+            try:
+                poses[start:end] = list(self.pose_model.predict_on_batch(self._pose_batch[start:end]))
+            except Exception as e:
+                logging.warning(f"Error in pose detection: {e}")
+                results[item_index] = self._proximity_violations(items[item_index][1])
+            start = end
+        return poses
+
+    def _fill_pose_batch(self, items: List[Tuple[np.ndarray, List[Dict]]]) -> List[Tuple[int, Dict]]:
+        """Resize every valid person ROI into the preallocated pose batch"""
+        total = sum(len(detections) for _, detections in items)
+        self._ensure_pose_batch(total)
+
+        owners = []
+        for item_index, (frame, detections) in enumerate(items):
+            height, width = frame.shape[:2]
             for detection in detections:
-                bbox = detection['bbox']
-                person_roi = frame[bbox[1]:bbox[3], bbox[0]:bbox[2]]
-                if person_roi.size > 0:  # Check if ROI is valid
-                    try:
-                        pose = self.pose_model.predict(
-                            cv2.resize(person_roi, (224, 224))[np.newaxis, ...],
-                            verbose=0
-                        )
-                        if self._is_unsafe_pose(pose):
-                            violations.append({
-                                'type': 'unsafe_pose',
-                                'location': ((bbox[0] + bbox[2])/2, (bbox[1] + bbox[3])/2),
-                                'confidence': detection['confidence']
-                            })
-                    except Exception as e:
-                        logging.warning(f"Error in pose detection: {e}")
-                        
+                x1, y1, x2, y2 = (int(v) for v in detection['bbox'])
+                x1, x2 = max(x1, 0), min(x2, width)
+                y1, y2 = max(y1, 0), min(y2, height)
+                if x2 <= x1 or y2 <= y1:  # Skip empty ROIs
+                    continue
+                cv2.resize(frame[y1:y2, x1:x2], self.POSE_INPUT_SIZE,
+                           dst=self._pose_batch[len(owners)])
+                owners.append((item_index, detection))
+        return owners
+
+    def _ensure_pose_batch(self, size: int):
+        """Grow the pose batch buffer so it holds at least size ROIs"""
+        if size <= len(self._pose_batch):
+            return
+        capacity = max(size, 2 * len(self._pose_batch))
+        self._pose_batch = np.empty((capacity, *self.POSE_INPUT_SIZE[::-1], 3), dtype=np.uint8)
+
+    def _proximity_violations(self, detections: List[Dict], min_distance: int = 50) -> List[Dict]:
+        """Report each pair of detections that are too close, once per pair"""
+        if len(detections) < 2:
+            return []
+
+        centers = bbox_centers(detections)
+        pairs, distances = find_close_pairs(centers, min_distance)
+
+        violations = []
+        for (i, j), distance in zip(pairs.tolist(), distances.tolist()):
+            midpoint = (centers[i] + centers[j]) / 2
+            track_ids = [detections[k].get('track_id') for k in (i, j)]
+            violations.append({
+                'type': 'proximity_violation',
+                'location': (float(midpoint[0]), float(midpoint[1])),
+                'confidence': min(detections[i]['confidence'], detections[j]['confidence']),
+                'distance': distance,
+                'pair': (i, j),
+                'track_id': sorted(track_ids) if None not in track_ids else None
+            })
         return violations
     
-    def _check_proximity(self, bbox1: Tuple, bbox2: Tuple, min_distance: int = 50) -> bool:
-        """Check if two bounding boxes are too close"""
-        center1 = ((bbox1[0] + bbox1[2])/2, (bbox1[1] + bbox1[3])/2)
-        center2 = ((bbox2[0] + bbox2[2])/2, (bbox2[1] + bbox2[3])/2)
-        distance = np.sqrt((center1[0] - center2[0])**2 + (center1[1] - center2[1])**2)
-        return distance < min_distance
-    
     def _is_unsafe_pose(self, pose) -> bool:
         """Analyze if pose is unsafe"""
         # Implementation depends on specific safety rules
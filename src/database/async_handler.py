@@ -0,0 +1,57 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from .handlers import DatabaseHandler
+
+class AsyncDatabaseHandler:
+    """
+    Awaitable facade over DatabaseHandler for use from the event loop
+
+    Queries run on a bounded thread pool sized to the engine's connection
+    pool, so a slow MySQL query never blocks the loop and query threads
+    always find a pooled connection; overflow connections are left to the
+    background writer.
+    """
+    def __init__(self, db_handler: DatabaseHandler, max_workers: int = None):
+        self.db_handler = db_handler
+        max_workers = max_workers or db_handler.engine.pool.size()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='db-query')
+
+    async def run(self, func, *args, **kwargs):
+        """Run a blocking database call on the query pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    async def stream(self, getter, *args, page_size: int = 1000, cursor=None, **kwargs):
+        """
+        Yield every row a paginated getter returns, one keyset page at a time
+
+        Each page is its own short query, so exporting a long range never
+        holds a connection open or more than one page in memory.
+        """
+        while True:
+            rows = await self.run(getter, *args, limit=page_size, cursor=cursor, **kwargs)
+            for row in rows:
+                yield row
+            if len(rows) < page_size:
+                return
+            cursor = (rows[-1].timestamp, rows[-1].id)
+
+    async def get_crowd_metrics(self, start_time=None, end_time=None, limit=100, cursor=None):
+        return await self.run(self.db_handler.get_crowd_metrics, start_time, end_time, limit, cursor)
+
+    async def get_person_detections(self, start_time=None, end_time=None, name=None, limit=100, cursor=None):
+        return await self.run(self.db_handler.get_person_detections, start_time, end_time, name, limit, cursor)
+
+    async def get_safety_violations(self, start_time=None, end_time=None, violation_type=None, limit=100, cursor=None):
+        return await self.run(self.db_handler.get_safety_violations, start_time, end_time, violation_type, limit, cursor)
+
+    async def get_behavior_analytics(self, start_time=None, end_time=None, anomaly_type=None, limit=100, cursor=None):
+        return await self.run(self.db_handler.get_behavior_analytics, start_time, end_time, anomaly_type, limit, cursor)
+
+    async def get_hourly_stats(self, date=None):
+        return await self.run(self.db_handler.get_hourly_stats, date)
+
+    def close(self):
+        """Shut down the query pool"""
+        self.executor.shutdown(wait=False)
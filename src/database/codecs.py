@@ -0,0 +1,60 @@
+import numpy as np
+from typing import Dict, List, Optional
+
+# Packed hotspot: int16 center plus uint16 size, 6 bytes
+HOTSPOT_DTYPE = np.dtype([('x', '<i2'), ('y', '<i2'), ('size', '<u2')])
+# Packed location: int16 coordinates, 4 bytes per point (a bbox is two points)
+POINT_DTYPE = np.dtype([('x', '<i2'), ('y', '<i2')])
+
+def encode_hotspots(hotspots: List[Dict]) -> bytes:
+    """Pack hotspot dicts ({'center': (x, y), 'size': n}) into bytes"""
+    packed = np.empty(len(hotspots), dtype=HOTSPOT_DTYPE)
+    if hotspots:
+        centers = np.asarray([h['center'] for h in hotspots], dtype=np.float64)
+        packed['x'] = np.clip(np.rint(centers[:, 0]), -32768, 32767)
+        packed['y'] = np.clip(np.rint(centers[:, 1]), -32768, 32767)
+        packed['size'] = np.clip([h['size'] for h in hotspots], 0, 65535)
+    return packed.tobytes()
+
+def decode_hotspots(blob: Optional[bytes]) -> np.ndarray:
+    """Unpack hotspots into a structured numpy array"""
+    return np.frombuffer(blob or b'', dtype=HOTSPOT_DTYPE)
+
+def encode_points(coordinates) -> bytes:
+    """Pack a flat coordinate sequence (x1, y1, x2, y2, ...) into bytes"""
+    values = np.clip(np.rint(np.asarray(coordinates, dtype=np.float64).ravel()), -32768, 32767)
+    return values.astype('<i2').tobytes()
+
+def decode_points(blob: Optional[bytes]) -> np.ndarray:
+    """Unpack points into a structured numpy array"""
+    return np.frombuffer(blob or b'', dtype=POINT_DTYPE)
+
+def decode_hotspot_list(blob: Optional[bytes]) -> List[Dict]:
+    """Unpack hotspots back into the JSON dict form"""
+    return [{'center': (int(x), int(y)), 'size': int(size)} for x, y, size in decode_hotspots(blob).tolist()]
+
+def decode_coordinate_list(blob: Optional[bytes]) -> List[int]:
+    """Unpack points back into a flat coordinate list"""
+    return np.frombuffer(blob or b'', dtype='<i2').tolist()
+
+def row_to_dict(row) -> Dict:
+    """
+    Convert an ORM row to a JSON-ready dict
+
+    Binary *_bin columns are decoded into the shape of the JSON column
+    they replace, so API consumers see the same payload either way.
+    """
+    data = {}
+    for column in row.__table__.columns:
+        value = getattr(row, column.name)
+        if column.name == 'hotspots_bin':
+            if value is not None:
+                data['hotspots'] = decode_hotspot_list(value)
+            continue
+        if column.name == 'location_bin':
+            if value is not None:
+                key = 'bbox' if row.__tablename__ == 'person_detections' else 'coordinates'
+                data['location'] = {key: decode_coordinate_list(value)}
+            continue
+        data[column.name] = value.isoformat() if hasattr(value, 'isoformat') else value
+    return data
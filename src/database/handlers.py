@@ -1,52 +1,112 @@
-from datetime import datetime
-from typing import Dict, List
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Float, JSON, func
+import atexit
+import json
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Set, Tuple
+import numpy as np
+from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Float, JSON, Index, LargeBinary, UniqueConstraint
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import sessionmaker
 from ..utils.logging_setup import logger
+from .writer import WriteBehindWriter
+from .rollups import RollupAggregator, GRANULARITIES, init_live_since, backfill_rollups
+from .migrations import apply_migrations
+from .retention import RetentionJob
+from .codecs import encode_hotspots, encode_points
+from .pagination import keyset
 
 Base = declarative_base()
 
 class Event(Base):
     __tablename__ = 'events'
+    __table_args__ = (
+        Index('ix_events_timestamp_type', 'timestamp', 'event_type'),
+    )
     id = Column(Integer, primary_key=True, autoincrement=True)
     timestamp = Column(DateTime, nullable=False)
     event_type = Column(String(255), nullable=False)
-    details = Column(String(1000))
+    details = Column(Text)  # JSON text
     confidence = Column(Float)
 
 class CrowdMetrics(Base):
     __tablename__ = 'crowd_metrics'
+    __table_args__ = (
+        Index('ix_crowd_metrics_timestamp_id', 'timestamp', 'id'),
+    )
     id = Column(Integer, primary_key=True, autoincrement=True)
     timestamp = Column(DateTime, nullable=False)
     density = Column(Float, nullable=False)
     person_count = Column(Integer, nullable=False)
     hotspots = Column(JSON)  # Stores hotspot locations and sizes
+    hotspots_bin = Column(LargeBinary)  # Packed hotspots when binary_columns is enabled
 
 class PersonDetections(Base):
     __tablename__ = 'person_detections'
+    __table_args__ = (
+        Index('ix_person_detections_timestamp_name', 'timestamp', 'person_name'),
+    )
     id = Column(Integer, primary_key=True, autoincrement=True)
     timestamp = Column(DateTime, nullable=False)
     person_name = Column(String(255))
     confidence = Column(Float)
     location = Column(JSON)  # Stores bbox coordinates
+    location_bin = Column(LargeBinary)  # Packed bbox when binary_columns is enabled
 
 class SafetyViolations(Base):
     __tablename__ = 'safety_violations'
+    __table_args__ = (
+        Index('ix_safety_violations_timestamp_type', 'timestamp', 'violation_type'),
+    )
     id = Column(Integer, primary_key=True, autoincrement=True)
     timestamp = Column(DateTime, nullable=False)
     violation_type = Column(String(255))
     location = Column(JSON)
+    location_bin = Column(LargeBinary)
     details = Column(JSON)
 
 class BehaviorAnalytics(Base):
     __tablename__ = 'behavior_analytics'
+    __table_args__ = (
+        Index('ix_behavior_analytics_timestamp_type', 'timestamp', 'anomaly_type'),
+    )
     id = Column(Integer, primary_key=True, autoincrement=True)
     timestamp = Column(DateTime, nullable=False)
     anomaly_type = Column(String(255))
     location = Column(JSON)
+    location_bin = Column(LargeBinary)
     details = Column(JSON)
 
+class MetricRollup(Base):
+    __tablename__ = 'metric_rollups'
+    __table_args__ = (
+        UniqueConstraint('granularity', 'camera_id', 'bucket_start', name='uq_metric_rollups_bucket'),
+        Index('ix_metric_rollups_granularity_bucket', 'granularity', 'bucket_start'),
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    granularity = Column(String(8), nullable=False)  # minute, hour or day
+    camera_id = Column(String(64), nullable=False)
+    bucket_start = Column(DateTime, nullable=False)
+    samples = Column(Integer, nullable=False, default=0)  # crowd samples folded in
+    sum_density = Column(Float, nullable=False, default=0.0)
+    max_density = Column(Float)
+    sum_count = Column(Integer, nullable=False, default=0)
+    max_count = Column(Integer)
+    violations = Column(Integer, nullable=False, default=0)
+    anomalies = Column(Integer, nullable=False, default=0)
+
+class RollupMarker(Base):
+    __tablename__ = 'rollup_markers'
+    name = Column(String(32), primary_key=True)  # live_since or backfilled_until
+    value = Column(DateTime, nullable=False)
+
+RAW_MODELS = {
+    'events': Event,
+    'crowd_metrics': CrowdMetrics,
+    'person_detections': PersonDetections,
+    'safety_violations': SafetyViolations,
+    'behavior_analytics': BehaviorAnalytics
+}
+
 class DatabaseHandler:
     """Handles database operations with MySQL"""
     def __init__(self, config: dict):
@@ -58,88 +118,190 @@ class DatabaseHandler:
         )
         
         try:
-            self.engine = create_engine(connection_string)
+            # Pool shared by the analysis writers and the API query threads
+            self.engine = create_engine(
+                connection_string,
+                pool_size=config.get('pool_size', 10),
+                max_overflow=config.get('max_overflow', 5),
+                pool_recycle=config.get('pool_recycle', 1800),
+                pool_pre_ping=True
+            )
             Base.metadata.create_all(self.engine)
+            apply_migrations(self.engine, Base.metadata,
+                             partition=config.get('partition_tables', False),
+                             months_ahead=config.get('partition_months_ahead', 3))
             self.Session = sessionmaker(bind=self.engine)
         except Exception as e:
             logger.error(f"Database connection error: {e}")
             raise
 
-    def log_crowd_metrics(self, density: float, count: int, hotspots: List[Dict]):
-        """Log crowd analysis metrics"""
-        session = self.Session()
-        try:
-            metric = CrowdMetrics(
-                timestamp=datetime.now(),
-                density=density,
-                person_count=count,
-                hotspots=hotspots
+        # Minute/hour/day rollups of every analysed frame, merged after each raw write
+        self.rollups = RollupAggregator(self.Session, MetricRollup)
+        self.rollups_live_since = init_live_since(self.Session, CrowdMetrics, MetricRollup, RollupMarker)
+        self._backfill_history()
+        self.retention = None
+        self.config = config
+        self.write_listeners = []
+        # Store hotspots and locations as packed int16 blobs instead of JSON
+        self.binary_columns = config.get('binary_columns', False)
+
+        # Rows are buffered and bulk inserted by a background writer
+        self.writer = None
+        if config.get('write_behind', True):
+            self.writer = WriteBehindWriter(
+                self.engine,
+                batch_size=config.get('batch_size', 500),
+                flush_interval_ms=config.get('flush_interval_ms', 200),
+                max_pending=config.get('max_pending_rows', 10000),
+                max_retry_delay=config.get('write_retry_max_seconds', 30.0),
+                on_flush=self._after_write
             )
-            session.add(metric)
-            session.commit()
-        except Exception as e:
-            logger.error(f"Database error: {e}")
-            session.rollback()
-        finally:
-            session.close()
+            atexit.register(self.close)
 
-    def log_person_detection(self, name: str, confidence: float, bbox: tuple):
-        """Log person detection"""
-        session = self.Session()
+    def _backfill_history(self):
+        """
+        Roll up raw rows written before live rollups started
+
+        Runs once per database: backfill_rollups records how far it got, so
+        later starts find nothing left to do. The retention job retries if
+        this fails.
+        """
         try:
-            detection = PersonDetections(
-                timestamp=datetime.now(),
-                person_name=name,
-                confidence=confidence,
-                location={'bbox': bbox}
-            )
-            session.add(detection)
-            session.commit()
+            samples = backfill_rollups(self.Session, RAW_MODELS, MetricRollup, RollupMarker,
+                                       self.rollups_live_since)
+            if samples:
+                logger.info(f"Backfilled {samples} crowd samples recorded before rollups into metric_rollups")
         except Exception as e:
-            logger.error(f"Database error: {e}")
-            session.rollback()
-        finally:
-            session.close()
+            logger.error(f"Rollup backfill error: {e}")
+
+    def start_retention(self):
+        """Start the background retention and compaction job if configured"""
+        if self.retention or not self.config.get('retention_days'):
+            return
+        self.retention = RetentionJob(
+            self,
+            RAW_MODELS,
+            MetricRollup,
+            RollupMarker,
+            retention_days=self.config['retention_days'],
+            minute_rollup_days=self.config.get('minute_rollup_retention_days', 7),
+            hour_rollup_days=self.config.get('hour_rollup_retention_days', 180),
+            interval_hours=self.config.get('retention_interval_hours', 6)
+        )
+        self.retention.start()
+
+    def close(self):
+        """Flush buffered rows and stop the background writer"""
+        if self.retention:
+            self.retention.stop()
+        if self.writer:
+            self.writer.close()
+        # Frame samples that arrived after the last raw write
+        self.rollups.flush()
+
+    def _insert(self, model, row: Dict):
+        """Insert a row through the write-behind buffer, or directly if disabled"""
+        if self.writer:
+            self.writer.submit(model, row)
+            return
 
-    def log_safety_violation(self, violation_type: str, location: tuple, details: Dict):
-        """Log safety violation"""
         session = self.Session()
         try:
-            violation = SafetyViolations(
-                timestamp=datetime.now(),
-                violation_type=violation_type,
-                location={'coordinates': location},
-                details=details
-            )
-            session.add(violation)
+            session.add(model(**row))
             session.commit()
         except Exception as e:
             logger.error(f"Database error: {e}")
             session.rollback()
         finally:
             session.close()
+        self._after_write({model.__tablename__: [row]})
+
+    def add_write_listener(self, callback: Callable[[Set[str]], None]):
+        """Register callback(table_names) to run after every committed write"""
+        self.write_listeners.append(callback)
+
+    def _after_write(self, tables: Dict[str, List[Dict]]):
+        """Called after raw rows are committed"""
+        changed = set(tables)
+        if self.rollups.flush():
+            changed.add(MetricRollup.__tablename__)
+        for callback in self.write_listeners:
+            try:
+                callback(changed)
+            except Exception as e:
+                logger.error(f"Write listener error: {e}")
+
+    def _packed(self, column: str, value, encoder) -> Dict:
+        """Fill either the JSON column or its packed *_bin counterpart"""
+        if self.binary_columns:
+            return {column: None, f"{column}_bin": encoder(value)}
+        return {column: value}
+
+    def log_event(self, event_type: str, details: Dict, confidence: float = None):
+        """Log generic event"""
+        self._insert(Event, {
+            'timestamp': datetime.now(),
+            'event_type': event_type,
+            'details': json.dumps(details, default=str),
+            'confidence': confidence
+        })
+
+    def sample_crowd(self, density: float, count: int, camera_id: str = 'default'):
+        """
+        Fold one analysed frame into the crowd rollups
+
+        Called for every frame, while crowd_metrics rows are only written on
+        count changes and keyframes, so rollup averages are per frame rather
+        than weighted towards moments when the count moved. Buffered samples
+        are merged on the next raw write (at least one keyframe per interval).
+        """
+        self.rollups.add_crowd_sample(camera_id, datetime.now(), density, count)
 
-    def log_behavior_anomaly(self, anomaly_type: str, location: tuple, details: Dict):
+    def log_crowd_metrics(self, density: float, count: int, hotspots: List[Dict], camera_id: str = 'default'):
+        """Log crowd analysis metrics; rollups are fed separately by sample_crowd"""
+        self._insert(CrowdMetrics, {
+            'timestamp': datetime.now(),
+            'density': density,
+            'person_count': count,
+            **self._packed('hotspots', hotspots, encode_hotspots)
+        })
+
+    def log_person_detection(self, name: str, confidence: float, bbox: tuple):
+        """Log person detection"""
+        self._insert(PersonDetections, {
+            'timestamp': datetime.now(),
+            'person_name': name,
+            'confidence': confidence,
+            **self._packed('location', {'bbox': bbox}, lambda loc: encode_points(loc['bbox']))
+        })
+
+    def log_safety_violation(self, violation_type: str, location: tuple, details: Dict,
+                             camera_id: str = 'default', occurrences: int = 1):
+        """Log safety violation"""
+        timestamp = datetime.now()
+        self.rollups.add_violations(camera_id, timestamp, occurrences)
+        self._insert(SafetyViolations, {
+            'timestamp': timestamp,
+            'violation_type': violation_type,
+            **self._packed('location', {'coordinates': location}, lambda loc: encode_points(loc['coordinates'])),
+            'details': details
+        })
+
+    def log_behavior_anomaly(self, anomaly_type: str, location: tuple, details: Dict,
+                             camera_id: str = 'default', occurrences: int = 1):
         """Log behavior anomaly"""
-        session = self.Session()
-        try:
-            anomaly = BehaviorAnalytics(
-                timestamp=datetime.now(),
-                anomaly_type=anomaly_type,
-                location={'coordinates': location},
-                details=details
-            )
-            session.add(anomaly)
-            session.commit()
-        except Exception as e:
-            logger.error(f"Database error: {e}")
-            session.rollback()
-        finally:
-            session.close()
+        timestamp = datetime.now()
+        self.rollups.add_anomalies(camera_id, timestamp, occurrences)
+        self._insert(BehaviorAnalytics, {
+            'timestamp': timestamp,
+            'anomaly_type': anomaly_type,
+            **self._packed('location', {'coordinates': location}, lambda loc: encode_points(loc['coordinates'])),
+            'details': details
+        })
 
     # Data retrieval methods
-    def get_crowd_metrics(self, start_time=None, end_time=None, limit=100):
-        """Get crowd metrics within time range"""
+    def get_crowd_metrics(self, start_time=None, end_time=None, limit=100, cursor=None):
+        """Get crowd metrics within time range, newest first, resuming after cursor"""
         session = self.Session()
         try:
             query = session.query(CrowdMetrics)
@@ -147,11 +309,11 @@ class DatabaseHandler:
                 query = query.filter(CrowdMetrics.timestamp >= start_time)
             if end_time:
                 query = query.filter(CrowdMetrics.timestamp <= end_time)
-            return query.order_by(CrowdMetrics.timestamp.desc()).limit(limit).all()
+            return keyset(query, CrowdMetrics, cursor).limit(limit).all()
         finally:
             session.close()
 
-    def get_person_detections(self, start_time=None, end_time=None, name=None, limit=100):
+    def get_person_detections(self, start_time=None, end_time=None, name=None, limit=100, cursor=None):
         """Get person detections with filters"""
         session = self.Session()
         try:
@@ -162,11 +324,11 @@ class DatabaseHandler:
                 query = query.filter(PersonDetections.timestamp <= end_time)
             if name:
                 query = query.filter(PersonDetections.person_name == name)
-            return query.order_by(PersonDetections.timestamp.desc()).limit(limit).all()
+            return keyset(query, PersonDetections, cursor).limit(limit).all()
         finally:
             session.close()
 
-    def get_safety_violations(self, start_time=None, end_time=None, violation_type=None, limit=100):
+    def get_safety_violations(self, start_time=None, end_time=None, violation_type=None, limit=100, cursor=None):
         """Get safety violations with filters"""
         session = self.Session()
         try:
@@ -177,11 +339,11 @@ class DatabaseHandler:
                 query = query.filter(SafetyViolations.timestamp <= end_time)
             if violation_type:
                 query = query.filter(SafetyViolations.violation_type == violation_type)
-            return query.order_by(SafetyViolations.timestamp.desc()).limit(limit).all()
+            return keyset(query, SafetyViolations, cursor).limit(limit).all()
         finally:
             session.close()
 
-    def get_behavior_analytics(self, start_time=None, end_time=None, anomaly_type=None, limit=100):
+    def get_behavior_analytics(self, start_time=None, end_time=None, anomaly_type=None, limit=100, cursor=None):
         """Get behavior analytics with filters"""
         session = self.Session()
         try:
@@ -192,23 +354,118 @@ class DatabaseHandler:
                 query = query.filter(BehaviorAnalytics.timestamp <= end_time)
             if anomaly_type:
                 query = query.filter(BehaviorAnalytics.anomaly_type == anomaly_type)
-            return query.order_by(BehaviorAnalytics.timestamp.desc()).limit(limit).all()
+            return keyset(query, BehaviorAnalytics, cursor).limit(limit).all()
         finally:
             session.close()
 
-    def get_hourly_stats(self, date=None):
-        """Get hourly statistics"""
+    def get_rollups(self, granularity: str = 'hour', camera_id: str = None,
+                    start_time=None, end_time=None) -> List[Dict]:
+        """Get rollup buckets, summed across cameras unless camera_id is given"""
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown rollup granularity: {granularity}")
         session = self.Session()
         try:
-            query = session.query(
-                func.hour(CrowdMetrics.timestamp).label('hour'),
-                func.avg(CrowdMetrics.density).label('avg_density'),
-                func.avg(CrowdMetrics.person_count).label('avg_count'),
-                func.count(CrowdMetrics.id).label('total_records')
-            )
-            if date:
-                query = query.filter(func.date(CrowdMetrics.timestamp) == date)
-            return query.group_by(func.hour(CrowdMetrics.timestamp)).all()
+            query = session.query(MetricRollup).filter(MetricRollup.granularity == granularity)
+            if camera_id:
+                query = query.filter(MetricRollup.camera_id == camera_id)
+            if start_time:
+                query = query.filter(MetricRollup.bucket_start >= start_time)
+            if end_time:
+                query = query.filter(MetricRollup.bucket_start <= end_time)
+            rows = query.order_by(MetricRollup.bucket_start).all()
         finally:
             session.close()
 
+        buckets = {}
+        for row in rows:
+            bucket = buckets.setdefault(row.bucket_start, {
+                'bucket_start': row.bucket_start,
+                'camera_id': camera_id,
+                **_empty_rollup()
+            })
+            _fold_rollup(bucket, row)
+        return [_finish_rollup(bucket) for bucket in buckets.values()]
+
+    def get_metric_series(self, metric: str, start_time: datetime, end_time: datetime,
+                          source: str = 'raw', camera_id: str = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get one crowd metric over a time range as numpy arrays
+
+        Args:
+            metric: 'density' or 'count'
+            source: 'raw' for crowd_metrics rows, or a rollup granularity
+                    (bucket averages, optionally for one camera)
+
+        Returns:
+            (epoch seconds, values), ordered by time
+        """
+        if metric not in ('density', 'count'):
+            raise ValueError(f"Unknown metric: {metric}")
+        if source != 'raw':
+            rows = self.get_rollups(source, camera_id, start_time, end_time)
+            times = np.array([row['bucket_start'].timestamp() for row in rows], dtype=np.float64)
+            return times, np.array([row[f'avg_{metric}'] for row in rows], dtype=np.float64)
+
+        column = CrowdMetrics.density if metric == 'density' else CrowdMetrics.person_count
+        session = self.Session()
+        try:
+            rows = (session.query(CrowdMetrics.timestamp, column)
+                    .filter(CrowdMetrics.timestamp >= start_time, CrowdMetrics.timestamp <= end_time)
+                    .order_by(CrowdMetrics.timestamp)
+                    .all())
+        finally:
+            session.close()
+        times = np.fromiter((row[0].timestamp() for row in rows), dtype=np.float64, count=len(rows))
+        values = np.fromiter((row[1] or 0 for row in rows), dtype=np.float64, count=len(rows))
+        return times, values
+
+    def get_hourly_stats(self, date=None):
+        """Get hourly statistics"""
+        if date:
+            start = datetime.combine(date, datetime.min.time())
+            rows = self.get_rollups('hour', start_time=start, end_time=start + timedelta(hours=23))
+        else:
+            rows = self.get_rollups('hour')
+
+        # Fold buckets into hours of the day
+        hours = defaultdict(_empty_rollup)
+        for row in rows:
+            _fold_rollup(hours[row['bucket_start'].hour], row)
+        stats = []
+        for hour, bucket in sorted(hours.items()):
+            _finish_rollup(bucket)
+            stats.append({
+                'hour': hour,
+                'avg_density': bucket['avg_density'],
+                'avg_count': bucket['avg_count'],
+                'max_density': bucket['max_density'],
+                'max_count': bucket['max_count'],
+                'violations': bucket['violations'],
+                'anomalies': bucket['anomalies'],
+                'total_records': bucket['samples']
+            })
+        return stats
+
+def _empty_rollup() -> Dict:
+    return {'samples': 0, 'sum_density': 0.0, 'max_density': None,
+            'sum_count': 0, 'max_count': None, 'violations': 0, 'anomalies': 0}
+
+def _fold_rollup(bucket: Dict, row):
+    """Add a rollup row (ORM object or dict) into an accumulating bucket"""
+    get = row.get if isinstance(row, dict) else lambda name: getattr(row, name)
+    bucket['samples'] += get('samples')
+    bucket['sum_density'] += get('sum_density')
+    bucket['sum_count'] += get('sum_count')
+    bucket['violations'] += get('violations')
+    bucket['anomalies'] += get('anomalies')
+    for field in ('max_density', 'max_count'):
+        value = get(field)
+        if value is not None:
+            bucket[field] = value if bucket[field] is None else max(bucket[field], value)
+
+def _finish_rollup(bucket: Dict) -> Dict:
+    """Derive averages for an accumulated bucket"""
+    samples = bucket['samples']
+    bucket['avg_density'] = bucket['sum_density'] / samples if samples else 0.0
+    bucket['avg_count'] = bucket['sum_count'] / samples if samples else 0.0
+    return bucket
@@ -0,0 +1,119 @@
+from datetime import date
+from sqlalchemy import Text, inspect, text
+from ..utils.logging_setup import logger
+
+def apply_migrations(engine, metadata, partition: bool = False, months_ahead: int = 3):
+    """
+    Bring an existing schema up to date with the model definitions
+
+    create_all only creates missing tables, so nullable columns and indexes
+    added to tables that already exist are created here, and VARCHAR
+    columns since changed to Text are widened. With partition=True
+    on MySQL the raw time-series tables are also range-partitioned by month.
+    """
+    inspector = inspect(engine)
+    for table in metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        columns = {column['name']: column for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            current = columns.get(column.name)
+            if current is None and column.nullable:
+                logger.info(f"Adding column {column.name} to {table.name}")
+                with engine.begin() as connection:
+                    connection.execute(text(
+                        f"ALTER TABLE {table.name} ADD COLUMN {column.name} "
+                        f"{column.type.compile(engine.dialect)}"
+                    ))
+            elif (current is not None and isinstance(column.type, Text)
+                  and not isinstance(current['type'], Text) and engine.dialect.name == 'mysql'):
+                logger.info(f"Widening column {column.name} of {table.name} to TEXT")
+                with engine.begin() as connection:
+                    connection.execute(text(f"ALTER TABLE {table.name} MODIFY COLUMN {column.name} TEXT"))
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        existing |= {c['name'] for c in inspector.get_unique_constraints(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                logger.info(f"Creating index {index.name} on {table.name}")
+                index.create(engine)
+
+    if partition:
+        if engine.dialect.name != 'mysql':
+            logger.warning("Time partitioning is only supported on MySQL, skipping")
+            return
+        for table_name in PARTITIONED_TABLES:
+            partition_by_month(engine, table_name, months_ahead)
+
+# Raw time-series tables; rollups stay small and are not partitioned
+PARTITIONED_TABLES = ('events', 'crowd_metrics', 'person_detections',
+                      'safety_violations', 'behavior_analytics')
+
+def _month_start(year: int, month: int) -> date:
+    year, month = year + (month - 1) // 12, (month - 1) % 12 + 1
+    return date(year, month, 1)
+
+def _partition_name(start: date) -> str:
+    return f"p{start.year:04d}{start.month:02d}"
+
+def partition_by_month(engine, table_name: str, months_ahead: int = 3):
+    """
+    Range-partition a MySQL table on TO_DAYS(timestamp), one partition per month
+
+    MySQL requires the partitioning column in every unique key, so the
+    primary key becomes (id, timestamp). Tables that are already
+    partitioned only get their future partitions topped up.
+    """
+    today = date.today()
+    with engine.begin() as connection:
+        partitions = {row[0] for row in connection.execute(text(
+            "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL"
+        ), {'table': table_name})}
+
+        months = [_month_start(today.year, today.month + offset) for offset in range(months_ahead + 1)]
+        if not partitions:
+            logger.info(f"Partitioning {table_name} by month")
+            connection.execute(text(f"ALTER TABLE {table_name} DROP PRIMARY KEY, ADD PRIMARY KEY (id, timestamp)"))
+            definitions = ', '.join(
+                f"PARTITION {_partition_name(start)} VALUES LESS THAN "
+                f"(TO_DAYS('{_month_start(start.year, start.month + 1).isoformat()}'))"
+                for start in months
+            )
+            # Everything older than the current month lands in the first partition
+            connection.execute(text(
+                f"ALTER TABLE {table_name} PARTITION BY RANGE (TO_DAYS(timestamp)) "
+                f"({definitions}, PARTITION pmax VALUES LESS THAN MAXVALUE)"
+            ))
+            return
+
+        missing = [start for start in months if _partition_name(start) not in partitions]
+        if missing:
+            definitions = ', '.join(
+                f"PARTITION {_partition_name(start)} VALUES LESS THAN "
+                f"(TO_DAYS('{_month_start(start.year, start.month + 1).isoformat()}'))"
+                for start in missing
+            )
+            connection.execute(text(
+                f"ALTER TABLE {table_name} REORGANIZE PARTITION pmax INTO "
+                f"({definitions}, PARTITION pmax VALUES LESS THAN MAXVALUE)"
+            ))
+
+def drop_partitions_before(engine, table_name: str, cutoff: date) -> int:
+    """
+    Drop monthly partitions that end on or before cutoff (MySQL only)
+
+    Returns:
+        Number of partitions dropped
+    """
+    if engine.dialect.name != 'mysql':
+        return 0
+    with engine.begin() as connection:
+        names = [row[0] for row in connection.execute(text(
+            "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME LIKE 'p______'"
+        ), {'table': table_name})]
+        expired = [name for name in names
+                   if _month_start(int(name[1:5]), int(name[5:7]) + 1) <= cutoff]
+        if expired:
+            connection.execute(text(f"ALTER TABLE {table_name} DROP PARTITION {', '.join(expired)}"))
+        return len(expired)
@@ -0,0 +1,46 @@
+import base64
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import and_, or_
+
+Cursor = Tuple[datetime, int]
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """Opaque, URL-safe token for the (timestamp, id) of the last row served"""
+    raw = f"{timestamp.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(token: str) -> Cursor:
+    """Inverse of encode_cursor, raises ValueError on a malformed token"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        timestamp, row_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {token}")
+
+def next_cursor(rows: List, limit: int) -> Optional[str]:
+    """
+    Cursor for the page after rows, or None when this was the last page
+
+    Accepts ORM rows or their row_to_dict form.
+    """
+    if len(rows) < limit or not rows:
+        return None
+    last = rows[-1]
+    if isinstance(last, dict):
+        return encode_cursor(datetime.fromisoformat(last['timestamp']), last['id'])
+    return encode_cursor(last.timestamp, last.id)
+
+def keyset(query, model, cursor: Optional[Cursor] = None):
+    """
+    Order newest first on (timestamp, id) and resume after cursor
+
+    Seeks through the time-leading index instead of using OFFSET, so every
+    page costs the same no matter how deep into the range it is.
+    """
+    if cursor:
+        timestamp, row_id = cursor
+        query = query.filter(or_(model.timestamp < timestamp,
+                                 and_(model.timestamp == timestamp, model.id < row_id)))
+    return query.order_by(model.timestamp.desc(), model.id.desc())
@@ -0,0 +1,97 @@
+import threading
+from datetime import datetime, timedelta
+from typing import Dict
+from ..utils.logging_setup import logger
+from .migrations import PARTITIONED_TABLES, drop_partitions_before, partition_by_month
+from .rollups import backfill_rollups
+
+class RetentionJob:
+    """
+    Keeps raw rows for retention_days and compacts older data into rollups
+
+    Each run:
+      1. backfills rollups from expiring raw rows written before live
+         rollups started, so nothing is lost on delete
+      2. deletes raw rows past retention, dropping whole monthly partitions
+         first when the table is partitioned
+      3. tiers the rollups: minute buckets are kept minute_rollup_days,
+         hour buckets hour_rollup_days, day buckets forever
+    """
+    DELETE_CHUNK = 5000
+
+    def __init__(self, db_handler, raw_models: Dict, rollup_model, marker_model, retention_days: int,
+                 minute_rollup_days: int = 7, hour_rollup_days: int = 180, interval_hours: float = 6):
+        self.db_handler = db_handler
+        self.raw_models = raw_models
+        self.rollup_model = rollup_model
+        self.marker_model = marker_model
+        self.retention_days = retention_days
+        self.minute_rollup_days = minute_rollup_days
+        self.hour_rollup_days = hour_rollup_days
+        self.interval = interval_hours * 3600
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='db-retention', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Retention job error: {e}")
+            self._stop.wait(self.interval)
+
+    def run_once(self, now: datetime = None):
+        now = now or datetime.now()
+        cutoff = now - timedelta(days=self.retention_days)
+
+        # Raises before anything is deleted if the backfill cannot be committed
+        backfilled = backfill_rollups(self.db_handler.Session, self.raw_models, self.rollup_model,
+                                      self.marker_model, cutoff, self.DELETE_CHUNK)
+        if backfilled:
+            logger.info(f"Retention: backfilled {backfilled} crowd samples into rollups")
+
+        engine = self.db_handler.engine
+        for table_name, model in self.raw_models.items():
+            dropped = 0
+            if table_name in PARTITIONED_TABLES and engine.dialect.name == 'mysql':
+                dropped = drop_partitions_before(engine, table_name, cutoff.date())
+                if self.db_handler.config.get('partition_tables'):
+                    partition_by_month(engine, table_name,
+                                       self.db_handler.config.get('partition_months_ahead', 3))
+            deleted = self._delete_before(model, model.timestamp, cutoff)
+            if dropped or deleted:
+                logger.info(f"Retention: {table_name} dropped {dropped} partitions, deleted {deleted} rows")
+
+        Rollup = self.rollup_model
+        for granularity, days in (('minute', self.minute_rollup_days), ('hour', self.hour_rollup_days)):
+            self._delete_before(Rollup, Rollup.bucket_start, now - timedelta(days=days),
+                                Rollup.granularity == granularity)
+
+    def _delete_before(self, model, column, cutoff: datetime, *criteria) -> int:
+        """Delete rows older than cutoff in primary-key chunks to keep transactions short"""
+        deleted = 0
+        while True:
+            session = self.db_handler.Session()
+            try:
+                ids = [row[0] for row in session.query(model.id)
+                       .filter(column < cutoff, *criteria)
+                       .limit(self.DELETE_CHUNK).all()]
+                if not ids:
+                    return deleted
+                session.query(model).filter(model.id.in_(ids)).delete(synchronize_session=False)
+                session.commit()
+                deleted += len(ids)
+            except Exception:
+                session.rollback()
+                raise
+            finally:
+                session.close()
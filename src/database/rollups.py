@@ -0,0 +1,218 @@
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from ..utils.logging_setup import logger
+
+GRANULARITIES = ('minute', 'hour', 'day')
+
+def bucket_start(timestamp: datetime, granularity: str) -> datetime:
+    """Truncate a timestamp to the start of its rollup bucket"""
+    if granularity == 'minute':
+        return timestamp.replace(second=0, microsecond=0)
+    if granularity == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    if granularity == 'day':
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unknown rollup granularity: {granularity}")
+
+def bucket_width(granularity: str) -> timedelta:
+    return {'minute': timedelta(minutes=1), 'hour': timedelta(hours=1), 'day': timedelta(days=1)}[granularity]
+
+class RollupAggregator:
+    """
+    Folds crowd samples and written events into per-camera minute/hour/day rollup deltas
+
+    Deltas accumulate in memory and are merged into the rollup table by
+    flush(), which the database handler calls right after each raw write,
+    so every rollup row is updated a handful of times per flush instead of
+    being recomputed from raw data.
+    """
+    def __init__(self, session_factory, model):
+        self.Session = session_factory
+        self.model = model
+        self._deltas = defaultdict(self._empty_delta)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _empty_delta() -> Dict:
+        return {'samples': 0, 'sum_density': 0.0, 'max_density': None,
+                'sum_count': 0, 'max_count': None, 'violations': 0, 'anomalies': 0}
+
+    def _buckets(self, camera_id: str, timestamp: datetime):
+        for granularity in GRANULARITIES:
+            yield self._deltas[(granularity, camera_id, bucket_start(timestamp, granularity))]
+
+    def add_crowd_sample(self, camera_id: str, timestamp: datetime, density: float, count: int):
+        with self._lock:
+            for delta in self._buckets(camera_id, timestamp):
+                delta['samples'] += 1
+                delta['sum_density'] += density
+                delta['sum_count'] += count
+                delta['max_density'] = density if delta['max_density'] is None else max(delta['max_density'], density)
+                delta['max_count'] = count if delta['max_count'] is None else max(delta['max_count'], count)
+
+    def add_violations(self, camera_id: str, timestamp: datetime, count: int = 1):
+        with self._lock:
+            for delta in self._buckets(camera_id, timestamp):
+                delta['violations'] += count
+
+    def add_anomalies(self, camera_id: str, timestamp: datetime, count: int = 1):
+        with self._lock:
+            for delta in self._buckets(camera_id, timestamp):
+                delta['anomalies'] += count
+
+    def merge_into(self, session) -> int:
+        """Merge pending deltas into session without committing, returning the number of buckets"""
+        with self._lock:
+            deltas, self._deltas = self._deltas, defaultdict(self._empty_delta)
+        for key, delta in deltas.items():
+            self._merge(session, key, delta)
+        return len(deltas)
+
+    def flush(self) -> int:
+        """Merge pending deltas into the rollup table, returning the number of buckets touched"""
+        with self._lock:
+            if not self._deltas:
+                return 0
+
+        session = self.Session()
+        try:
+            touched = self.merge_into(session)
+            session.commit()
+        except Exception as e:
+            logger.error(f"Rollup update error: {e}")
+            session.rollback()
+            return 0
+        finally:
+            session.close()
+        return touched
+
+    def _merge(self, session, key: Tuple, delta: Dict):
+        granularity, camera_id, start = key
+        Rollup = self.model
+        row = session.query(Rollup).filter(
+            Rollup.granularity == granularity,
+            Rollup.camera_id == camera_id,
+            Rollup.bucket_start == start
+        ).with_for_update().one_or_none()
+
+        if row is None:
+            session.add(Rollup(
+                granularity=granularity,
+                camera_id=camera_id,
+                bucket_start=start,
+                samples=delta['samples'],
+                sum_density=delta['sum_density'],
+                max_density=delta['max_density'],
+                sum_count=delta['sum_count'],
+                max_count=delta['max_count'],
+                violations=delta['violations'],
+                anomalies=delta['anomalies']
+            ))
+            return
+
+        row.samples += delta['samples']
+        row.sum_density += delta['sum_density']
+        row.sum_count += delta['sum_count']
+        row.violations += delta['violations']
+        row.anomalies += delta['anomalies']
+        if delta['max_density'] is not None:
+            row.max_density = delta['max_density'] if row.max_density is None else max(row.max_density, delta['max_density'])
+        if delta['max_count'] is not None:
+            row.max_count = delta['max_count'] if row.max_count is None else max(row.max_count, delta['max_count'])
+
+# Markers kept in the rollup marker table
+LIVE_SINCE = 'live_since'  # raw rows from here on are folded into rollups as they are written
+BACKFILLED_UNTIL = 'backfilled_until'  # raw rows before this have been folded in by backfill
+
+def get_marker(session, marker_model, name: str) -> Optional[datetime]:
+    row = session.get(marker_model, name)
+    return row.value if row else None
+
+def set_marker(session, marker_model, name: str, value: datetime):
+    row = session.get(marker_model, name)
+    if row is None:
+        session.add(marker_model(name=name, value=value))
+    else:
+        row.value = value
+
+def init_live_since(session_factory, raw_model, rollup_model, marker_model) -> datetime:
+    """
+    Record when live rollups started, once per database
+
+    A fresh rollup table starts now. A table filled by an earlier version
+    that kept no marker starts at the first hourly bucket that is still
+    backed by raw rows: anything older was backfilled from raw data that
+    retention has since deleted.
+    """
+    session = session_factory()
+    try:
+        live_since = get_marker(session, marker_model, LIVE_SINCE)
+        if live_since is not None:
+            return live_since
+        oldest_raw = session.query(func.min(raw_model.timestamp)).scalar()
+        query = session.query(func.min(rollup_model.bucket_start)).filter(rollup_model.granularity == 'hour')
+        if oldest_raw is not None:
+            query = query.filter(rollup_model.bucket_start >= bucket_start(oldest_raw, 'hour'))
+        live_since = query.scalar() or datetime.now()
+        session.add(marker_model(name=LIVE_SINCE, value=live_since))
+        session.commit()
+        return live_since
+    except IntegrityError:
+        # Another worker recorded it first
+        session.rollback()
+        return get_marker(session, marker_model, LIVE_SINCE)
+    finally:
+        session.close()
+
+def backfill_rollups(session_factory, raw_models: Dict, rollup_model, marker_model,
+                     end: datetime, chunk: int = 5000) -> int:
+    """
+    Fold raw rows that predate live rollups into the rollup table
+
+    Only stored crowd_metrics rows are available here, so backfilled crowd
+    averages are per stored row, not per analysed frame like live rollups.
+    Covers [backfilled_until, min(end, live_since)). The rollup deltas and
+    the advanced backfilled_until marker are committed together, so a row
+    is folded in exactly once however often this runs or fails.
+
+    Returns:
+        Number of crowd samples folded in
+    """
+    session = session_factory()
+    try:
+        live_since = get_marker(session, marker_model, LIVE_SINCE)
+        start = get_marker(session, marker_model, BACKFILLED_UNTIL)
+        end = min(end, live_since) if live_since else end
+        if start is not None and start >= end:
+            return 0
+
+        aggregator = RollupAggregator(session_factory, rollup_model)
+        samples = 0
+        for table_name, add in (('crowd_metrics', None),
+                                ('safety_violations', aggregator.add_violations),
+                                ('behavior_analytics', aggregator.add_anomalies)):
+            model = raw_models[table_name]
+            columns = (model.timestamp, model.density, model.person_count) if add is None else (model.timestamp,)
+            query = session.query(*columns).filter(model.timestamp < end)
+            if start is not None:
+                query = query.filter(model.timestamp >= start)
+            for row in query.yield_per(chunk):
+                if add is None:
+                    aggregator.add_crowd_sample('default', *row)
+                    samples += 1
+                else:
+                    add('default', row[0])
+
+        aggregator.merge_into(session)
+        set_marker(session, marker_model, BACKFILLED_UNTIL, end)
+        session.commit()
+        return samples
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
@@ -0,0 +1,185 @@
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+from sqlalchemy import insert
+from sqlalchemy.exc import DisconnectionError, InterfaceError, OperationalError, TimeoutError
+from ..utils.logging_setup import logger
+
+# Errors that say the database is unreachable rather than that the rows are bad
+RETRYABLE_ERRORS = (OperationalError, InterfaceError, DisconnectionError, TimeoutError)
+
+class WriteBehindWriter:
+    """
+    Buffers rows per table and writes them from a background thread
+
+    A flush happens every batch_size rows or flush_interval_ms milliseconds,
+    whichever comes first, with one bulk INSERT per table inside a single
+    transaction. Producers block for up to block_timeout seconds once
+    max_pending rows are waiting; rows that still do not fit are dropped.
+
+    If the database is unreachable the batch is put back and retried with
+    exponential backoff (up to max_retry_delay seconds). If the batch is
+    rejected, it is retried table by table and then row by row, so only
+    the offending rows are dropped.
+    """
+    def __init__(self, engine, batch_size: int = 500, flush_interval_ms: int = 200,
+                 max_pending: int = 10000, block_timeout: float = 1.0, max_retry_delay: float = 30.0,
+                 on_flush: Optional[Callable[[Dict[str, List[Dict]]], None]] = None):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_pending = max_pending
+        self.block_timeout = block_timeout
+        self.on_flush = on_flush
+        self.dropped = 0
+        self.max_retry_delay = max_retry_delay
+        self._retry_delay = 0.0  # > 0 while the database is unreachable
+
+        self._buffers = defaultdict(list)  # table -> rows
+        self._pending = 0
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='db-write-behind', daemon=True)
+        self._thread.start()
+
+    def submit(self, model, row: Dict) -> bool:
+        """
+        Queue a row for insertion into model's table
+
+        Returns:
+            False if the row was dropped because the buffer stayed full
+        """
+        with self._condition:
+            if self._pending >= self.max_pending:
+                self._condition.notify_all()  # wake the writer early
+                self._condition.wait_for(lambda: self._pending < self.max_pending or not self._running,
+                                         timeout=self.block_timeout)
+                if self._pending >= self.max_pending:
+                    self.dropped += 1
+                    logger.warning(f"Write-behind buffer full, dropped row for {model.__tablename__}")
+                    return False
+            self._buffers[model.__table__].append(row)
+            self._pending += 1
+            if self._pending >= self.batch_size:
+                self._condition.notify_all()
+        return True
+
+    def flush(self) -> bool:
+        """
+        Write out everything buffered so far
+
+        Returns:
+            False if the database was unreachable and the rows were put back
+        """
+        with self._condition:
+            buffers, self._buffers = self._buffers, defaultdict(list)
+            self._pending = 0
+            self._condition.notify_all()  # release blocked producers
+        failed = self._write(buffers)
+        if not failed:
+            self._retry_delay = 0.0
+            return True
+
+        self._retry_delay = min(self.max_retry_delay, max(self.flush_interval, self._retry_delay * 2))
+        with self._condition:
+            # Back in front of anything submitted meanwhile, to keep insert order
+            for table, rows in failed.items():
+                self._buffers[table][:0] = rows
+                self._pending += len(rows)
+        return False
+
+    def close(self, attempts: int = 3):
+        """Stop the background thread and flush the remaining rows"""
+        with self._condition:
+            if not self._running:
+                return
+            self._running = False
+            self._condition.notify_all()
+        self._thread.join()
+        for _ in range(attempts):
+            if self.flush():
+                return
+            time.sleep(self._retry_delay)
+        logger.error(f"Database unreachable at shutdown, discarding {self._pending} buffered rows")
+        self.dropped += self._pending
+
+    def _run(self):
+        while True:
+            with self._condition:
+                deadline = time.monotonic() + self.flush_interval
+                while self._running and self._pending < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                if not self._running:
+                    return
+            if self._pending and not self.flush():
+                with self._condition:
+                    self._condition.wait_for(lambda: not self._running, timeout=self._retry_delay)
+
+    def _write(self, buffers: Dict) -> Dict:
+        """
+        Bulk insert the given rows, one executemany per table
+
+        Returns:
+            The rows that could not be written because the database was
+            unreachable, by table
+        """
+        if not buffers:
+            return {}
+        with self._flush_lock:
+            try:
+                with self.engine.begin() as connection:
+                    for table, rows in buffers.items():
+                        connection.execute(insert(table), rows)
+                written, failed = buffers, {}
+            except RETRYABLE_ERRORS as e:
+                logger.error(f"Database unavailable, will retry {sum(map(len, buffers.values()))} rows: {e}")
+                return buffers
+            except Exception as e:
+                logger.error(f"Batch insert rejected, retrying per table: {e}")
+                written, failed = self._write_isolated(buffers)
+
+            # Listeners run under the flush lock so they never overlap
+            if self.on_flush and written:
+                try:
+                    self.on_flush({table.name: rows for table, rows in written.items()})
+                except Exception as e:
+                    logger.error(f"Write listener error: {e}")
+            return failed
+
+    def _write_isolated(self, buffers: Dict):
+        """Insert each table on its own, falling back to single rows for a rejected table"""
+        written, failed = {}, {}
+        tables = list(buffers.items())
+        for position, (table, rows) in enumerate(tables):
+            try:
+                with self.engine.begin() as connection:
+                    connection.execute(insert(table), rows)
+                written[table] = rows
+                continue
+            except RETRYABLE_ERRORS:
+                failed.update(tables[position:])
+                return written, failed
+            except Exception:
+                pass
+
+            kept = []
+            for index, row in enumerate(rows):
+                try:
+                    with self.engine.begin() as connection:
+                        connection.execute(insert(table), [row])
+                    kept.append(row)
+                except RETRYABLE_ERRORS:
+                    failed[table] = rows[index:]
+                    failed.update(tables[position + 1:])
+                    written[table] = kept
+                    return written, failed
+                except Exception as e:
+                    self.dropped += 1
+                    logger.error(f"Dropped row rejected by {table.name}: {e}")
+            written[table] = kept
+        return written, failed
@@ -0,0 +1,195 @@
+from fastapi import APIRouter, Body, HTTPException, Query, Request, Response
+from datetime import datetime, timedelta
+from email.utils import formatdate, parsedate_to_datetime
+import asyncio
+import json
+from typing import Dict, Optional
+from config.config import SystemConfig
+from ..core.alert_system import alert_severity
+from ..utils.settings_store import RUNTIME_SETTINGS, validate_settings, save_settings, load_settings
+from . import metrics
+from .video import frame_hub, encode_executor
+
+# Routes used by frontend/src/services/api.js
+router = APIRouter(prefix="/api")
+
+# timeRange -> (span, rollup granularity)
+TIME_RANGES = {
+    '1h': (timedelta(hours=1), 'minute'),
+    '24h': (timedelta(days=1), 'hour'),
+    '7d': (timedelta(days=7), 'hour'),
+    '30d': (timedelta(days=30), 'day')
+}
+
+# Set up by setup() from the app lifespan
+config: Optional[SystemConfig] = None
+
+def setup(system_config: SystemConfig):
+    global config
+    config = system_config
+
+@router.get("/cameras")
+async def get_cameras():
+    _, state = metrics.metrics_state.snapshot()
+    cameras = []
+    for camera_id, source in (config.cameras or {}).items():
+        latest = frame_hub.latest(camera_id)
+        crowd = state.get(camera_id, {}).get('crowd') or {}
+        cameras.append({
+            'id': camera_id,
+            'source': str(source),
+            'live': latest is not None,
+            'lastFrame': datetime.fromtimestamp(latest[1]).isoformat() if latest else None,
+            'peopleCount': crowd.get('count'),
+            'density': crowd.get('density'),
+            'stream': f"/video/{camera_id}/mjpeg"
+        })
+    return cameras
+
+def _not_modified(request: Request, etag: str, modified: float) -> bool:
+    """Evaluate If-None-Match, then If-Modified-Since (RFC 9110 precedence)"""
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in tags or etag in tags or f'W/{etag}' in tags
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since:
+        try:
+            return int(modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def _validators(etag: str, modified: float) -> Dict:
+    return {
+        'ETag': etag,
+        'Last-Modified': formatdate(modified, usegmt=True),
+        'Cache-Control': 'no-cache'
+    }
+
+@router.get("/cameras/{camera_id}/snapshot")
+async def get_snapshot(camera_id: str, request: Request, annotated: bool = False, profile: str = 'full'):
+    """
+    Latest frame as JPEG, raw or with the last analysis drawn on it
+
+    The ETag is the frame sequence number, so polling an unchanged camera
+    costs a header comparison; encoding goes through the frame hub cache.
+    """
+    if profile not in frame_hub.profiles:
+        raise HTTPException(status_code=400, detail=f"Unknown profile: {profile}")
+    latest = frame_hub.latest(camera_id, annotated)
+    if latest is None:
+        raise HTTPException(status_code=404, detail=f"No frame for camera: {camera_id}")
+    seq, modified, _ = latest
+    kind = 'annotated' if annotated else 'raw'
+    etag = f'"{camera_id}-{kind}-{profile}-{seq}"'
+    if _not_modified(request, etag, modified):
+        return Response(status_code=304, headers=_validators(etag, modified))
+
+    loop = asyncio.get_running_loop()
+    # A newer frame may have arrived meanwhile; label the body with the frame it holds
+    seq, modified, jpeg = await loop.run_in_executor(encode_executor, frame_hub.jpeg, camera_id, profile, annotated)
+    etag = f'"{camera_id}-{kind}-{profile}-{seq}"'
+    return Response(jpeg, media_type='image/jpeg', headers=_validators(etag, modified))
+
+# camera_id -> (version, serialized state); avoids re-serializing for every poller
+_state_bodies = {}
+
+@router.get("/cameras/{camera_id}/state")
+async def get_state(camera_id: str, request: Request):
+    """Latest analysis for a camera, with ETag/Last-Modified on its update sequence"""
+    state = metrics.metrics_state.camera(camera_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail=f"No analysis for camera: {camera_id}")
+    version = state['version']
+    etag = f'"{camera_id}-{version}"'
+    headers = _validators(etag, state['updated'])
+    if _not_modified(request, etag, state['updated']):
+        return Response(status_code=304, headers=headers)
+
+    cached = _state_bodies.get(camera_id)
+    if cached is None or cached[0] != version:
+        cached = (version, json.dumps({'camera_id': camera_id, **state}).encode())
+        _state_bodies[camera_id] = cached
+    return Response(cached[1], media_type='application/json', headers=headers)
+
+@router.get("/metrics")
+async def get_metrics(timeRange: str = Query(default='24h', pattern='^(1h|24h|7d|30d)$'),
+                      camera_id: Optional[str] = None):
+    """Rollup buckets and totals for a dashboard time range"""
+    span, granularity = TIME_RANGES[timeRange]
+
+    async def load():
+        end = datetime.now()
+        buckets = await metrics.async_db.run(metrics.db_handler.get_rollups, granularity, camera_id,
+                                             end - span, end)
+        samples = sum(bucket['samples'] for bucket in buckets)
+        return {
+            'timeRange': timeRange,
+            'granularity': granularity,
+            'summary': {
+                'avgDensity': sum(b['sum_density'] for b in buckets) / samples if samples else 0.0,
+                'avgCount': sum(b['sum_count'] for b in buckets) / samples if samples else 0.0,
+                'maxCount': max((b['max_count'] for b in buckets if b['max_count'] is not None), default=None),
+                'violations': sum(b['violations'] for b in buckets),
+                'anomalies': sum(b['anomalies'] for b in buckets)
+            },
+            'buckets': [{
+                'time': bucket['bucket_start'].isoformat(),
+                'avgDensity': bucket['avg_density'],
+                'avgCount': bucket['avg_count'],
+                'maxCount': bucket['max_count'],
+                'violations': bucket['violations'],
+                'anomalies': bucket['anomalies']
+            } for bucket in buckets]
+        }
+
+    return await metrics.cache.get_or_load(('api_metrics', timeRange, camera_id), load,
+                                           tags=('metric_rollups',))
+
+@router.get("/alerts")
+async def get_alerts(type: Optional[str] = None, severity: Optional[str] = None,
+                     since: Optional[datetime] = None, limit: int = Query(default=50, ge=1, le=500)):
+    """Stored safety violations and behavior anomalies, newest first, in alert form"""
+    violations, anomalies = await asyncio.gather(
+        metrics.async_db.get_safety_violations(since, None, None, limit),
+        metrics.async_db.get_behavior_analytics(since, None, None, limit)
+    )
+    alerts = [_stored_alert('safety_violation', row.violation_type, row) for row in violations]
+    alerts += [_stored_alert('behavior_anomaly', row.anomaly_type, row) for row in anomalies]
+    if type:
+        alerts = [alert for alert in alerts if type in (alert['type'], alert['subtype'])]
+    if severity:
+        alerts = [alert for alert in alerts if alert['severity'] == severity]
+    alerts.sort(key=lambda alert: alert['timestamp'], reverse=True)
+    return alerts[:limit]
+
+def _stored_alert(alert_type: str, subtype: str, row) -> Dict:
+    return {
+        'id': f"{alert_type}:{row.id}",
+        'timestamp': row.timestamp.isoformat(),
+        'type': alert_type,
+        'subtype': subtype,
+        'severity': alert_severity(alert_type, config.alert_severities),
+        'details': row.details
+    }
+
+@router.get("/settings")
+async def get_settings():
+    stored = load_settings(config.settings_path)
+    return {name: stored.get(name, getattr(config, name)) for name in RUNTIME_SETTINGS}
+
+@router.put("/settings")
+async def update_settings(settings: Dict = Body(...)):
+    """
+    Change runtime settings
+
+    Overrides are stored in settings_path; the worker that owns the
+    cameras picks them up from there, whichever worker served this request.
+    """
+    try:
+        validate_settings(settings)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    stored = save_settings(config.settings_path, settings)
+    return {'status': 'ok', 'settings': {name: stored.get(name, getattr(config, name)) for name in RUNTIME_SETTINGS}}
@@ -1,10 +1,21 @@
-from fastapi import APIRouter, WebSocket, Query
-from datetime import datetime, date
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from datetime import datetime, date, timedelta
 from typing import Optional
 from ..database.handlers import DatabaseHandler
+from ..database.async_handler import AsyncDatabaseHandler
+from ..database.codecs import row_to_dict
+from ..database.pagination import decode_cursor, next_cursor
+from ..database.rollups import bucket_start, bucket_width
+from ..utils.cache import TTLCache
+from ..utils.downsample import lttb, minmax
+from ..utils.websockets import ConnectionManager
+from ..utils.delta_protocol import DeltaSession
+from ..core.metrics_state import MetricsState, MetricsBroadcaster
+from ..core.alert_system import SEVERITY_LEVELS
 from pathlib import Path
 import yaml
-import asyncio
+import json
 router = APIRouter()
 
 # Load configuration
@@ -24,54 +35,224 @@ def load_config():
             'password': ''
         }
 
-# Initialize database handler with config
-db_handler = DatabaseHandler(config=load_config())
+# Set up by setup() from the app lifespan, so importing this module does no I/O
+db_handler: Optional[DatabaseHandler] = None
+# Queries are offloaded to a bounded thread pool so they never block the event loop
+async_db: Optional[AsyncDatabaseHandler] = None
+# Identical dashboard queries share one result until a write touches their table
+cache = TTLCache()
+# Live metrics are pushed from memory; the processing loop publishes into metrics_state
+metrics_state = MetricsState()
+manager = ConnectionManager()
+broadcaster = MetricsBroadcaster(metrics_state, manager)
 
+def setup(handler: Optional[DatabaseHandler] = None, db_config: Optional[dict] = None):
+    """Attach the database; creates a handler from config/config.yml when none is given"""
+    global db_handler, async_db, cache
+    db_config = load_config() if db_config is None else db_config
+    db_handler = handler or DatabaseHandler(config=db_config)
+    async_db = AsyncDatabaseHandler(db_handler)
+    cache = TTLCache(maxsize=db_config.get('cache_max_entries', 256), ttl=db_config.get('cache_ttl_seconds', 5.0))
+    db_handler.add_write_listener(lambda tables: cache.invalidate(tables))
+
+async def shutdown():
+    await broadcaster.stop()
+    if async_db:
+        async_db.close()
+
+async def _cached_rows(table: str, getter, **params):
+    """Serialized query result shared across clients, tagged with its table"""
+    key = (table, tuple(sorted(params.items())))
+    async def load():
+        return [row_to_dict(row) for row in await async_db.run(getter, **params)]
+    return await cache.get_or_load(key, load, tags=(table,))
+
+
+def _parse_cursor(cursor: Optional[str]):
+    if cursor is None:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def _paginated(table: str, getter, filters: dict, limit: int, cursor: Optional[str], format: str):
+    """
+    Serve one keyset page as JSON, or the whole range as NDJSON
+
+    JSON pages carry an X-Next-Cursor header while more rows remain. In
+    ndjson mode limit is the page size used to walk the range, and rows
+    are written out as each page arrives from the database.
+    """
+    position = _parse_cursor(cursor)
+    if format == 'ndjson':
+        async def lines():
+            async for row in async_db.stream(getter, page_size=limit, cursor=position, **filters):
+                yield json.dumps(row_to_dict(row), default=str) + '\n'
+        return StreamingResponse(lines(), media_type='application/x-ndjson')
+
+    rows = await _cached_rows(table, getter, limit=limit, cursor=position, **filters)
+    headers = {}
+    token = next_cursor(rows, limit)
+    if token:
+        headers['X-Next-Cursor'] = token
+    return JSONResponse(rows, headers=headers)
 
 @router.get("/metrics/crowd")
 async def get_crowd_metrics(
     start_time: Optional[datetime] = None,
     end_time: Optional[datetime] = None,
-    limit: int = Query(default=100, le=1000)
+    limit: int = Query(default=100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    format: str = Query(default='json', pattern='^(json|ndjson)$')
 ):
-    return db_handler.get_crowd_metrics(start_time, end_time, limit)
+    filters = {'start_time': start_time, 'end_time': end_time}
+    return await _paginated('crowd_metrics', db_handler.get_crowd_metrics, filters, limit, cursor, format)
 
 @router.get("/metrics/persons")
 async def get_person_detections(
     start_time: Optional[datetime] = None,
     end_time: Optional[datetime] = None,
     name: Optional[str] = None,
-    limit: int = Query(default=100, le=1000)
+    limit: int = Query(default=100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    format: str = Query(default='json', pattern='^(json|ndjson)$')
 ):
-    return db_handler.get_person_detections(start_time, end_time, name, limit)
+    filters = {'start_time': start_time, 'end_time': end_time, 'name': name}
+    return await _paginated('person_detections', db_handler.get_person_detections, filters, limit, cursor, format)
 
 @router.get("/metrics/safety")
 async def get_safety_violations(
     start_time: Optional[datetime] = None,
     end_time: Optional[datetime] = None,
     violation_type: Optional[str] = None,
-    limit: int = Query(default=100, le=1000)
+    limit: int = Query(default=100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    format: str = Query(default='json', pattern='^(json|ndjson)$')
+):
+    filters = {'start_time': start_time, 'end_time': end_time, 'violation_type': violation_type}
+    return await _paginated('safety_violations', db_handler.get_safety_violations, filters, limit, cursor, format)
+
+def _series_source(start_time: datetime, end_time: datetime, camera_id: Optional[str]) -> str:
+    """Pick the cheapest store that still has enough resolution for the range"""
+    span = end_time - start_time
+    if span <= timedelta(days=1) and camera_id is None:
+        return 'raw'
+    if span <= timedelta(days=7):
+        return 'minute'
+    return 'hour'
+
+@router.get("/metrics/series")
+async def get_metric_series(
+    metric: str = Query(default='density', pattern='^(density|count)$'),
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    points: int = Query(default=500, ge=3, le=5000),
+    method: str = Query(default='lttb', pattern='^(lttb|minmax)$'),
+    source: str = Query(default='auto', pattern='^(auto|raw|minute|hour|day)$'),
+    camera_id: Optional[str] = None
 ):
-    return db_handler.get_safety_violations(start_time, end_time, violation_type, limit)
+    """
+    A metric over a time range, downsampled to at most `points` points
+
+    Returns columnar arrays: t (epoch milliseconds) and v (values).
+    """
+    open_ended = end_time is None
+    end_time = end_time or datetime.now()
+    span = end_time - start_time if start_time else timedelta(days=1)
+    if source == 'auto':
+        source = _series_source(end_time - span, end_time, camera_id)
+    if open_ended:
+        # "Until now" is rounded up to the source's bucket (a minute for raw
+        # data) so repeated default requests share a cache entry; new rows
+        # still show up because writes invalidate the entry
+        width = 'minute' if source == 'raw' else source
+        end_time = bucket_start(end_time, width) + bucket_width(width)
+    start_time = start_time or end_time - span
+    if source == 'raw' and camera_id is not None:
+        raise HTTPException(status_code=400, detail="camera_id requires a rollup source")
+
+    async def load():
+        times, values = await async_db.run(db_handler.get_metric_series, metric, start_time, end_time,
+                                           source, camera_id)
+        times, values = (lttb if method == 'lttb' else minmax)(times, values, points)
+        return {
+            'metric': metric,
+            'source': source,
+            'method': method,
+            't': (times * 1000).astype('int64').tolist(),
+            'v': values.tolist()
+        }
+
+    key = ('series', metric, start_time, end_time, points, method, source, camera_id)
+    table = 'crowd_metrics' if source == 'raw' else 'metric_rollups'
+    return await cache.get_or_load(key, load, tags=(table,))
 
 @router.get("/metrics/hourly")
 async def get_hourly_stats(date: Optional[date] = None):
-    return db_handler.get_hourly_stats(date)
+    return await cache.get_or_load(('hourly', date), lambda: async_db.get_hourly_stats(date),
+                                   tags=('metric_rollups',))
 
 @router.websocket("/ws/metrics")
-async def websocket_metrics(websocket: WebSocket):
-    await websocket.accept()
+async def websocket_metrics(websocket: WebSocket, protocol: str = Query(default='json', pattern='^(json|delta)$')):
+    """
+    Live metrics and alerts
+
+    Clients receive everything until they narrow it down by sending
+    {"subscribe": {...}} or {"unsubscribe": {...}} with any of "cameras",
+    "kinds" (crowd, violations, behavior, alerts) and "severities".
+
+    ?protocol=delta opts into msgpack deltas of the metrics messages against
+    the client's last acknowledged snapshot; clients acknowledge with
+    {"ack": seq} (see src/utils/delta_protocol.py).
+    """
+    await manager.connect(websocket)
+    session = DeltaSession() if protocol == 'delta' else None
+    broadcaster.add(websocket, session)
+    broadcaster.start()
     try:
+        # Current state and missed alerts right away, then updates arrive from the broadcaster
+        current = broadcaster.current(websocket)
+        if current:
+            manager.send(websocket, current)
+        await broadcaster.replay(websocket)
         while True:
-            # Send real-time metrics every second
-            metrics = {
-                'crowd': db_handler.get_crowd_metrics(limit=1),
-                'violations': db_handler.get_safety_violations(limit=1),
-                'behavior': db_handler.get_behavior_analytics(limit=1)
-            }
-            await websocket.send_json(metrics)
-            await asyncio.sleep(1)
+            message = await websocket.receive()
+            if message['type'] == 'websocket.disconnect':
+                break
+            data = message.get('bytes') or message.get('text')
+            if isinstance(data, bytes):
+                # Binary frames only carry delta acks
+                if session is not None:
+                    session.receive(data)
+                continue
+            try:
+                request = json.loads(data or '')
+            except ValueError:
+                continue
+            if not isinstance(request, dict):
+                continue
+            if 'ack' in request:
+                if session is not None:
+                    session.receive(data)
+                continue
+            topics = broadcaster.topics(websocket)
+            if isinstance(request.get('subscribe'), dict):
+                topics = topics.subscribe(request['subscribe'])
+            elif isinstance(request.get('unsubscribe'), dict):
+                _, cameras = metrics_state.snapshot()
+                topics = topics.unsubscribe(request['unsubscribe'], cameras, SEVERITY_LEVELS)
+            else:
+                continue
+            broadcaster.set_topics(websocket, topics)
+            manager.send(websocket, json.dumps({'type': 'subscribed', 'topics': topics.to_dict()}))
+            current = broadcaster.current(websocket)
+            if current:
+                manager.send(websocket, current)
+    except WebSocketDisconnect:
+        pass
     except Exception as e:
         print(f"WebSocket error: {e}")
     finally:
-        await websocket.close() 
\ No newline at end of file
+        broadcaster.remove(websocket)
+        manager.disconnect(websocket)
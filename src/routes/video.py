@@ -0,0 +1,70 @@
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi.responses import Response, StreamingResponse
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+from ..core.frame_hub import FrameHub
+from ..utils.logging_setup import logger
+
+router = APIRouter()
+
+# Capture threads publish into this hub (pass it to CCTVSystem / VideoStream)
+frame_hub = FrameHub()
+
+# JPEG encoding releases the GIL, so a few threads keep it off the event loop
+encode_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='jpeg-encode')
+
+async def _jpeg_frames(camera_id: str, profile: str, annotated: bool = False):
+    """Yield (seq, jpeg) for each new frame a viewer can keep up with"""
+    loop = asyncio.get_running_loop()
+    seq = 0
+    while True:
+        seq, _, _ = await frame_hub.next_frame(camera_id, seq)
+        # Shared cache: only the first viewer of a frame pays for the encode
+        encoded = await loop.run_in_executor(encode_executor, frame_hub.jpeg, camera_id, profile, annotated)
+        if encoded is None:
+            # Annotated view before the first analysis
+            continue
+        seq, _, jpeg = encoded
+        yield seq, jpeg
+
+def _require_camera(camera_id: str, profile: str):
+    if not frame_hub.has_camera(camera_id):
+        raise HTTPException(status_code=404, detail=f"Unknown camera: {camera_id}")
+    if profile not in frame_hub.profiles:
+        raise HTTPException(status_code=400, detail=f"Unknown profile: {profile}")
+
+@router.get("/video/{camera_id}/mjpeg")
+async def mjpeg_feed(camera_id: str, profile: str = 'full', annotated: bool = False):
+    """Motion JPEG stream, usable directly as an <img> source; annotated=true draws the latest detections"""
+    _require_camera(camera_id, profile)
+
+    async def parts():
+        async for _, jpeg in _jpeg_frames(camera_id, profile, annotated):
+            yield (b'--frame\r\nContent-Type: image/jpeg\r\n'
+                   b'Content-Length: ' + str(len(jpeg)).encode() + b'\r\n\r\n' + jpeg + b'\r\n')
+
+    return StreamingResponse(parts(), media_type='multipart/x-mixed-replace; boundary=frame',
+                             headers={'Cache-Control': 'no-cache, no-store'})
+
+@router.get("/video/{camera_id}/frame.jpg")
+async def frame_jpeg(camera_id: str, profile: str = 'full'):
+    """Latest frame as a single JPEG, e.g. for snapshots and alert thumbnails"""
+    _require_camera(camera_id, profile)
+    loop = asyncio.get_running_loop()
+    seq, _, jpeg = await loop.run_in_executor(encode_executor, frame_hub.jpeg, camera_id, profile)
+    return Response(jpeg, media_type='image/jpeg', headers={'X-Frame-Seq': str(seq)})
+
+@router.websocket("/ws/video/{camera_id}")
+async def video_websocket(websocket: WebSocket, camera_id: str, profile: str = 'full', annotated: bool = False):
+    """One binary message per frame, each a complete JPEG"""
+    await websocket.accept()
+    if not frame_hub.has_camera(camera_id) or profile not in frame_hub.profiles:
+        await websocket.close(code=4404)
+        return
+    try:
+        async for _, jpeg in _jpeg_frames(camera_id, profile, annotated):
+            await websocket.send_bytes(jpeg)
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Video websocket error: {str(e)}")
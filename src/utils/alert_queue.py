@@ -0,0 +1,227 @@
+import json
+import os
+import queue
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+from .logging_setup import logger
+
+OVERFLOW_POLICIES = ('drop_oldest', 'coalesce', 'spill')
+
+class BoundedAlertQueue:
+    """
+    Bounded FIFO for undelivered alerts with a configurable overflow policy
+
+    drop_oldest: discard the oldest alert to make room
+    coalesce:    merge into a queued alert with the same camera and type,
+                 adding up its count (falls back to drop_oldest)
+    spill:       append overflow to on-disk JSON-lines segments, read back in
+                 order as the in-memory part drains; segments left over from a
+                 previous run are replayed too
+
+    Exposes the subset of the queue.Queue interface the alert system uses.
+    """
+    def __init__(self, maxsize: int = 1000, policy: str = 'drop_oldest', spill_dir: Optional[str] = None,
+                 segment_size: int = 1000, max_segments: int = 100):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        if policy == 'spill' and not spill_dir:
+            raise ValueError("The spill overflow policy requires a spill directory")
+
+        self.maxsize = maxsize
+        self.policy = policy
+        self.dropped = 0
+        self._items = deque()
+        self._index = {}  # coalesce key -> queued alert
+        self._lock = threading.Lock()
+
+        self.spill_dir = spill_dir
+        self.segment_size = segment_size
+        self.max_segments = max_segments
+        self._segments = deque()  # segment paths, oldest first
+        self._spilled = 0
+        self._write_file = None
+        self._write_count = 0
+        self._read_file = None
+        if policy == 'spill':
+            os.makedirs(spill_dir, exist_ok=True)
+            self._recover_segments()
+
+    # queue.Queue compatible interface
+    def put(self, alert: Dict, block: bool = True, timeout: Optional[float] = None):
+        with self._lock:
+            if self._spilled:
+                # Older alerts are on disk, keep FIFO order by appending behind them
+                self._spill(alert)
+            elif len(self._items) < self.maxsize:
+                self._append(alert)
+            elif self.policy == 'spill':
+                self._spill(alert)
+            elif self.policy == 'coalesce' and self._coalesce(alert):
+                pass
+            else:
+                self._pop()
+                self.dropped += 1
+                self._append(alert)
+
+    def put_nowait(self, alert: Dict):
+        self.put(alert)
+
+    def get_nowait(self) -> Dict:
+        with self._lock:
+            if not self._items:
+                self._refill()
+            if not self._items:
+                raise queue.Empty
+            return self._pop()
+
+    def get(self, block: bool = True, timeout: Optional[float] = None) -> Dict:
+        return self.get_nowait()
+
+    def qsize(self) -> int:
+        with self._lock:
+            return len(self._items) + self._spilled
+
+    def empty(self) -> bool:
+        return self.qsize() == 0
+
+    def full(self) -> bool:
+        # Overflow is always absorbed by the policy, so producers never block
+        return False
+
+    def drain(self) -> List[Dict]:
+        """Remove and return every queued alert, oldest first"""
+        alerts = []
+        while True:
+            try:
+                alerts.append(self.get_nowait())
+            except queue.Empty:
+                return alerts
+
+    def take(self, predicate, limit: int) -> List[Dict]:
+        """
+        Remove and return up to limit queued alerts matching predicate, oldest first
+
+        Alerts that do not match keep their place. Spilled alerts are read
+        back only as far as the in-memory part has room, so memory stays
+        bounded however large the backlog is.
+        """
+        with self._lock:
+            self._refill()
+            taken, kept = [], []
+            while self._items:
+                alert = self._pop()
+                (taken if len(taken) < limit and predicate(alert) else kept).append(alert)
+            for alert in kept:
+                self._append(alert)
+            return taken
+
+    def restore(self, alerts: List[Dict]):
+        """Put alerts returned by take() back at the front, in their original order"""
+        with self._lock:
+            for alert in reversed(alerts):
+                self._items.appendleft(alert)
+                if self.policy == 'coalesce':
+                    self._index.setdefault(self._coalesce_key(alert), alert)
+
+    # In-memory part
+    @staticmethod
+    def _coalesce_key(alert: Dict):
+        return (alert.get('camera_id'), alert.get('type'))
+
+    def _append(self, alert: Dict):
+        self._items.append(alert)
+        if self.policy == 'coalesce':
+            self._index[self._coalesce_key(alert)] = alert
+
+    def _pop(self) -> Dict:
+        alert = self._items.popleft()
+        key = self._coalesce_key(alert)
+        if self._index.get(key) is alert:
+            del self._index[key]
+        return alert
+
+    def _coalesce(self, alert: Dict) -> bool:
+        queued = self._index.get(self._coalesce_key(alert))
+        if queued is None:
+            return False
+        queued['count'] = queued.get('count', 1) + alert.get('count', 1)
+        queued['timestamp'] = alert.get('timestamp', queued.get('timestamp'))
+        queued['details'] = alert.get('details', queued.get('details'))
+        return True
+
+    # On-disk part
+    def _recover_segments(self):
+        """Pick up segments written by a previous run"""
+        names = sorted(n for n in os.listdir(self.spill_dir) if n.startswith('alerts-') and n.endswith('.jsonl'))
+        for name in names:
+            path = os.path.join(self.spill_dir, name)
+            with open(path, 'r') as f:
+                self._spilled += sum(1 for _ in f)
+            self._segments.append(path)
+        if self._spilled:
+            logger.info(f"Recovered {self._spilled} spilled alerts from {self.spill_dir}")
+
+    def _next_segment_path(self) -> str:
+        last = os.path.basename(self._segments[-1]) if self._segments else 'alerts-00000000.jsonl'
+        number = int(last[len('alerts-'):-len('.jsonl')]) + 1
+        return os.path.join(self.spill_dir, f"alerts-{number:08d}.jsonl")
+
+    def _spill(self, alert: Dict):
+        if self._write_file is None or self._write_count >= self.segment_size:
+            if self._write_file is not None:
+                self._write_file.close()
+            if len(self._segments) >= self.max_segments:
+                self._discard_oldest_segment()
+            path = self._next_segment_path()
+            self._segments.append(path)
+            self._write_file = open(path, 'a')
+            self._write_count = 0
+        self._write_file.write(json.dumps(alert, default=str) + '\n')
+        self._write_file.flush()
+        self._write_count += 1
+        self._spilled += 1
+
+    def _refill(self):
+        """Move spilled alerts back into memory, oldest segment first"""
+        while self._spilled and len(self._items) < self.maxsize:
+            if self._read_file is None:
+                self._read_file = open(self._segments[0], 'r')
+            line = self._read_file.readline()
+            if line:
+                self._spilled -= 1
+                try:
+                    self._append(json.loads(line))
+                except ValueError:
+                    # Torn write from a crash, nothing to recover
+                    logger.warning(f"Skipping unreadable spilled alert in {self._segments[0]}")
+                continue
+            if self._write_file is not None and self._segments[0] == self._write_file.name:
+                break
+            self._close_read_segment()
+        if not self._spilled and self._read_file is not None:
+            # Everything on disk has been read; retire the segment, active or
+            # not, so a restart does not replay delivered alerts
+            if self._write_file is not None:
+                self._write_file.close()
+                self._write_file = None
+            self._close_read_segment()
+
+    def _close_read_segment(self):
+        self._read_file.close()
+        self._read_file = None
+        os.remove(self._segments.popleft())
+
+    def _discard_oldest_segment(self):
+        path = self._segments[0]
+        if self._read_file is not None:
+            # Count what is left of a partially read segment
+            remaining = sum(1 for _ in self._read_file)
+            self._close_read_segment()
+        else:
+            with open(path, 'r') as f:
+                remaining = sum(1 for _ in f)
+            os.remove(self._segments.popleft())
+        self._spilled -= remaining
+        self.dropped += remaining
+        logger.warning(f"Alert spill limit reached, dropped {remaining} alerts from {path}")
@@ -0,0 +1,107 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Iterable, Optional
+
+_MISSING = object()
+
+class TTLCache:
+    """
+    Size-bounded LRU cache whose entries also expire after ttl seconds
+
+    Entries are tagged (e.g. with the tables they were read from) so the
+    write path can drop exactly the entries a write makes stale. All
+    methods are thread-safe; get_or_load additionally coalesces concurrent
+    misses for the same key on the event loop into a single load.
+    """
+    def __init__(self, maxsize: int = 256, ttl: float = 5.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value, tags)
+        self._generations = {}  # tag -> invalidation counter
+        self._inflight = {}  # key -> asyncio.Future
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, tags: Iterable[str] = ()):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value, frozenset(tags))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, tags: Optional[Iterable[str]] = None):
+        """Drop entries carrying any of tags, or everything when tags is None"""
+        with self._lock:
+            if tags is None:
+                self._entries.clear()
+                for tag in self._generations:
+                    self._generations[tag] += 1
+                return
+            tags = set(tags)
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+            for key in [k for k, entry in self._entries.items() if entry[2] & tags]:
+                del self._entries[key]
+
+    def _snapshot(self, tags: frozenset) -> tuple:
+        with self._lock:
+            return tuple(self._generations.setdefault(tag, 0) for tag in sorted(tags))
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]],
+                          tags: Iterable[str] = ()) -> Any:
+        """
+        Return the cached value for key, awaiting loader() on a miss
+
+        Callers that miss while a load for the same key is running wait for
+        it instead of issuing their own; if that load is cancelled (its
+        client went away) one of them takes over. A result is not cached if
+        one of its tags was invalidated while it was loading.
+        """
+        while True:
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+            pending = self._inflight.get(key)
+            if pending is None:
+                break
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise  # this caller was cancelled, not the load
+
+        tags = frozenset(tags)
+        generation = self._snapshot(tags)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else is waiting
+            raise
+        else:
+            if self._snapshot(tags) == generation:
+                self.set(key, value, tags)
+            future.set_result(value)
+            return value
+        finally:
+            del self._inflight[key]
+            if not future.done():
+                # Cancelled (client disconnect) or interrupted: release the waiters
+                future.cancel()
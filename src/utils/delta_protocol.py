@@ -0,0 +1,109 @@
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple, Union
+from .logging_setup import logger
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+    logger.warning("msgpack not installed, delta metric protocol will fall back to JSON text")
+
+def diff(old: Dict, new: Dict, path: Tuple = ()) -> Tuple[Dict, List[List]]:
+    """
+    Compute the changes that turn old into new
+
+    Returns:
+        (patch, removed): patch is a nested dict holding only changed
+        values (nested dicts are diffed recursively, anything else is
+        replaced whole); removed lists the key paths that disappeared
+    """
+    patch, removed = {}, []
+    for key, value in new.items():
+        if key not in old:
+            patch[key] = value
+        elif isinstance(value, dict) and isinstance(old[key], dict):
+            sub_patch, sub_removed = diff(old[key], value, path + (key,))
+            if sub_patch:
+                patch[key] = sub_patch
+            removed.extend(sub_removed)
+        elif value != old[key]:
+            patch[key] = value
+    removed.extend([list(path + (key,)) for key in old if key not in new])
+    return patch, removed
+
+def apply_patch(base: Dict, patch: Dict, removed: List[List]) -> Dict:
+    """Inverse of diff, for clients written in Python and for testing"""
+    result = dict(base)
+    for key, value in patch.items():
+        if isinstance(value, dict) and isinstance(result.get(key), dict):
+            result[key] = apply_patch(result[key], value, [])
+        else:
+            result[key] = value
+    for key_path in removed:
+        target = result
+        for key in key_path[:-1]:
+            target[key] = dict(target[key])
+            target = target[key]
+        target.pop(key_path[-1], None)
+    return result
+
+class DeltaSession:
+    """
+    Per-client state for the delta metric protocol
+
+    Messages are {'t': 'key', 'seq', 'data'} keyframes or
+    {'t': 'delta', 'seq', 'base', 'set', 'del'} deltas against the last
+    snapshot the client acknowledged with {"ack": seq}. A keyframe is sent
+    first, whenever the client's base is unknown, and every
+    keyframe_interval seconds. Payloads are msgpack when available and
+    binary is requested, JSON text otherwise.
+    """
+    def __init__(self, binary: bool = True, keyframe_interval: float = 10.0, history: int = 32):
+        self.binary = binary and msgpack is not None
+        self.keyframe_interval = keyframe_interval
+        self.history = history
+        self.seq = 0
+        self.acked = None
+        self._sent = OrderedDict()  # seq -> snapshot, for the last `history` messages
+        self._last_keyframe = None
+
+    def encode(self, snapshot: Dict, now: Optional[float] = None) -> Union[bytes, str]:
+        """Build the next message for snapshot"""
+        now = time.monotonic() if now is None else now
+        # Normalize to plain types so diffs compare what the client sees
+        snapshot = json.loads(json.dumps(snapshot, default=str))
+        self.seq += 1
+
+        base = self._sent.get(self.acked) if self.acked is not None else None
+        if base is None or self._last_keyframe is None or now - self._last_keyframe >= self.keyframe_interval:
+            message = {'t': 'key', 'seq': self.seq, 'data': snapshot}
+            self._last_keyframe = now
+        else:
+            patch, removed = diff(base, snapshot)
+            message = {'t': 'delta', 'seq': self.seq, 'base': self.acked, 'set': patch, 'del': removed}
+
+        self._sent[self.seq] = snapshot
+        while len(self._sent) > self.history:
+            self._sent.popitem(last=False)
+        return self._pack(message)
+
+    def receive(self, data: Union[bytes, str]):
+        """Handle a message from the client (currently only acks)"""
+        try:
+            message = msgpack.unpackb(data) if isinstance(data, bytes) and msgpack else json.loads(data)
+        except Exception:
+            logger.warning("Ignoring malformed delta protocol message")
+            return
+        seq = message.get('ack') if isinstance(message, dict) else None
+        if isinstance(seq, int) and seq in self._sent:
+            self.acked = seq
+            # Older snapshots can no longer be used as a base
+            for old in [s for s in self._sent if s < seq]:
+                del self._sent[old]
+
+    def _pack(self, message: Dict) -> Union[bytes, str]:
+        if self.binary:
+            return msgpack.packb(message, use_bin_type=True)
+        return json.dumps(message)
@@ -0,0 +1,73 @@
+import numpy as np
+from typing import Tuple
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Largest-Triangle-Three-Buckets downsampling
+
+    Keeps the first and last points and, from each of threshold - 2 equal
+    buckets in between, the point forming the largest triangle with the
+    previously kept point and the next bucket's average. Preserves the
+    visual shape of a line chart far better than striding.
+
+    Args:
+        x: Sorted sample times (any numeric unit)
+        y: Values
+        threshold: Number of points to return
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return x, y
+
+    # Bucket boundaries over the interior points 1 .. n-2
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], max(edges[bucket + 1], edges[bucket] + 1)
+        if bucket + 2 < len(edges):
+            next_start, next_end = edges[bucket + 1], max(edges[bucket + 2], edges[bucket + 1] + 1)
+            next_x, next_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+
+        # Twice the triangle area; the constant factor does not change the argmax
+        areas = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+
+    return x[selected], y[selected]
+
+def minmax(x: np.ndarray, y: np.ndarray, threshold: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Min/max bucket downsampling
+
+    Splits the series into threshold // 2 equal-count buckets and keeps the
+    minimum and maximum of each, in time order, so spikes are never lost.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    buckets = threshold // 2
+    if threshold >= n or buckets < 1:
+        return x, y
+
+    starts = np.linspace(0, n, buckets + 1).astype(np.int64)[:-1]
+    # reduceat gives each bucket's extreme values; the first index in the
+    # bucket that reaches them is then found with one scatter-min pass
+    mins = np.minimum.reduceat(y, starts)
+    maxs = np.maximum.reduceat(y, starts)
+    bucket_of = np.repeat(np.arange(buckets), np.diff(np.append(starts, n)))
+    index = np.arange(n)
+    first_min = np.full(buckets, n)
+    first_max = np.full(buckets, n)
+    np.minimum.at(first_min, bucket_of, np.where(y == mins[bucket_of], index, n))
+    np.minimum.at(first_max, bucket_of, np.where(y == maxs[bucket_of], index, n))
+
+    selected = np.unique(np.concatenate([first_min, first_max]))  # sorted, deduplicated
+    return x[selected], y[selected]
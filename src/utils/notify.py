@@ -0,0 +1,37 @@
+import asyncio
+import threading
+from typing import Callable
+
+class ChangeNotifier:
+    """
+    Wakes coroutines on any event loop when producers on other threads notify
+
+    Waiters pass a predicate that is re-checked on every wakeup, so a
+    notify that lands between the check and the wait is never lost.
+    """
+    def __init__(self):
+        self._events = {}  # event loop -> asyncio.Event
+        self._lock = threading.Lock()
+
+    def notify(self):
+        """Wake every waiter; safe to call from any thread"""
+        with self._lock:
+            events = list(self._events.items())
+        for loop, event in events:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # Event loop already closed
+                with self._lock:
+                    self._events.pop(loop, None)
+
+    async def wait_for(self, predicate: Callable[[], bool]):
+        """Wait until predicate() is true"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            event = self._events.setdefault(loop, asyncio.Event())
+        while True:
+            event.clear()
+            if predicate():
+                return
+            await event.wait()
@@ -0,0 +1,70 @@
+import json
+import os
+from dataclasses import fields
+from typing import Dict, Optional
+from config.config import SystemConfig
+from .logging_setup import logger
+
+# SystemConfig fields that can be changed while the system is running
+RUNTIME_SETTINGS = (
+    'min_confidence',
+    'max_crowd_density',
+    'working_hours',
+    'alert_cooldown_seconds',
+    'alert_cooldowns',
+    'alert_severities',
+    'event_count_delta',
+    'event_keyframe_interval'
+)
+
+def validate_settings(updates: Dict) -> Dict:
+    """Check that updates only touch runtime settings; raises ValueError otherwise"""
+    unknown = sorted(set(updates) - set(RUNTIME_SETTINGS))
+    if unknown:
+        raise ValueError(f"Settings cannot be changed at runtime: {', '.join(unknown)}")
+    defaults = {field.name: field.default for field in fields(SystemConfig)}
+    for name, value in updates.items():
+        default = defaults[name]
+        if isinstance(default, (int, float)) and not isinstance(default, bool):
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                raise ValueError(f"{name} must be a number")
+        elif isinstance(default, tuple) and (not isinstance(value, (list, tuple)) or len(value) != len(default)):
+            raise ValueError(f"{name} must be a list of {len(default)} values")
+        elif default is None and value is not None and not isinstance(value, dict):
+            raise ValueError(f"{name} must be a mapping")
+    return updates
+
+def load_settings(path: str) -> Dict:
+    """Read the stored overrides, or {} if there are none"""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except ValueError as e:
+        logger.error(f"Ignoring unreadable settings file {path}: {e}")
+        return {}
+
+def save_settings(path: str, updates: Dict) -> Dict:
+    """Merge updates into the stored overrides and return the result"""
+    settings = {**load_settings(path), **updates}
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, 'w') as f:
+        json.dump(settings, f, indent=2)
+    os.replace(temporary, path)  # atomic, readers never see a partial file
+    return settings
+
+def apply_settings(config: SystemConfig, settings: Dict):
+    """Apply stored overrides to a live config"""
+    for name, value in settings.items():
+        if name in RUNTIME_SETTINGS:
+            setattr(config, name, tuple(value) if isinstance(getattr(config, name), tuple) else value)
+
+def settings_mtime(path: str) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime
+    except FileNotFoundError:
+        return None
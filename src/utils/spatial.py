@@ -0,0 +1,128 @@
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
+from typing import Dict, List, Tuple
+
+def bbox_centers(detections: List[Dict]) -> np.ndarray:
+    """
+    Compute bounding box centers for a list of detections
+
+    Args:
+        detections: Detections with a 'bbox' of (x1, y1, x2, y2)
+
+    Returns:
+        numpy.ndarray: (N, 2) float array of (x, y) centers
+    """
+    if not detections:
+        return np.empty((0, 2), dtype=np.float64)
+    boxes = np.asarray([d['bbox'] for d in detections], dtype=np.float64)
+    return np.column_stack(((boxes[:, 0] + boxes[:, 2]) / 2,
+                            (boxes[:, 1] + boxes[:, 3]) / 2))
+
+def find_close_pairs(points: np.ndarray, min_distance: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Find every unique pair of points closer than min_distance
+
+    Uses a KD-tree so only nearby candidates are considered, then computes
+    the distances for those candidates in one vectorized pass.
+
+    Args:
+        points: (N, 2) array of point coordinates
+        min_distance: Pairs strictly closer than this are returned
+
+    Returns:
+        Tuple of (pairs, distances) where pairs is a (K, 2) int array with
+        i < j in each row and distances is the matching (K,) float array
+    """
+    if len(points) < 2:
+        return np.empty((0, 2), dtype=np.intp), np.empty(0, dtype=np.float64)
+
+    tree = cKDTree(points)
+    pairs = tree.query_pairs(r=min_distance, output_type='ndarray')
+    if len(pairs) == 0:
+        return np.empty((0, 2), dtype=np.intp), np.empty(0, dtype=np.float64)
+
+    deltas = points[pairs[:, 0]] - points[pairs[:, 1]]
+    distances = np.hypot(deltas[:, 0], deltas[:, 1])
+
+    # query_pairs is inclusive of the radius, the proximity rule is not
+    close = distances < min_distance
+    return pairs[close], distances[close]
+
+# Same cell plus the forward half of the 8-neighbourhood, so each cell pair is visited once
+_GRID_NEIGHBOUR_OFFSETS = ((0, 0), (1, 0), (0, 1), (1, 1), (1, -1))
+
+def _grid_pairs(points: np.ndarray, eps: float) -> np.ndarray:
+    """Unique (i, j) pairs within eps, found by comparing points in the same or adjacent eps-sized cells"""
+    cells = np.floor(points / eps).astype(np.int64)
+    cells -= cells.min(axis=0)
+    # Leave spare rows so the (1, -1) offset never wraps onto an occupied cell
+    stride = cells[:, 1].max() + 3
+    keys = cells[:, 0] * stride + cells[:, 1]
+    order = np.argsort(keys, kind='stable')
+    occupied, starts, sizes = np.unique(keys[order], return_index=True, return_counts=True)
+    point_cells = np.searchsorted(occupied, keys)
+
+    pairs = []
+    for dx, dy in _GRID_NEIGHBOUR_OFFSETS:
+        neighbours = occupied[point_cells] + dx * stride + dy
+        index = np.searchsorted(occupied, neighbours)
+        index[index == len(occupied)] = 0
+        found = occupied[index] == neighbours
+        # Every point against every point of its neighbouring cell
+        counts = np.where(found, sizes[index], 0)
+        first = np.repeat(np.arange(len(points)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        second = order[np.repeat(starts[index], counts) + offsets]
+        if (dx, dy) == (0, 0):
+            keep = first < second
+            first, second = first[keep], second[keep]
+        deltas = points[first] - points[second]
+        close = np.hypot(deltas[:, 0], deltas[:, 1]) <= eps
+        pairs.append(np.column_stack((first[close], second[close])))
+    return np.concatenate(pairs)
+
+def grid_cluster(points: np.ndarray, eps: float, min_samples: int) -> np.ndarray:
+    """
+    DBSCAN over a uniform grid
+
+    Neighbours are found by hashing points into eps-sized cells and
+    measuring real distances only against the same and adjacent cells,
+    which is near-linear for the sparse scenes seen here. Core points
+    (at least min_samples points within eps, counting themselves) that are
+    within eps of each other form clusters, and other points join a
+    neighbouring core point's cluster, as in DBSCAN.
+
+    Args:
+        points: (N, 2) array of point coordinates
+        eps: Neighbourhood radius in pixels
+        min_samples: Points needed within eps for a core point
+
+    Returns:
+        numpy.ndarray: (N,) cluster labels, -1 for noise, like DBSCAN.fit_predict
+    """
+    n = len(points)
+    if n == 0:
+        return np.empty(0, dtype=np.intp)
+
+    pairs = _grid_pairs(np.asarray(points, dtype=np.float64), eps)
+    core = np.bincount(pairs.ravel(), minlength=n) + 1 >= min_samples
+    linked = pairs[core[pairs[:, 0]] & core[pairs[:, 1]]]
+
+    adjacency = coo_matrix((np.ones(len(linked), dtype=np.int8), (linked[:, 0], linked[:, 1])), shape=(n, n))
+    _, components = connected_components(adjacency, directed=False)
+
+    labels = np.full(n, -1, dtype=np.intp)
+    labels[core] = components[core]
+    # Border points take the cluster of a core neighbour
+    for border, other in ((pairs[:, 0], pairs[:, 1]), (pairs[:, 1], pairs[:, 0])):
+        attach = ~core[border] & core[other]
+        labels[border[attach]] = components[other[attach]]
+
+    # Renumber clusters from 0 in order of first appearance, like DBSCAN
+    clustered = labels >= 0
+    _, first_seen, inverse = np.unique(labels[clustered], return_index=True, return_inverse=True)
+    rank = np.argsort(np.argsort(first_seen))
+    labels[clustered] = rank[inverse.ravel()]
+    return labels
@@ -1,22 +1,162 @@
+import asyncio
+import json
+from collections import deque
+from typing import Dict, List, Optional, Union
 from fastapi import WebSocket
-from ..utils.logging_setup import logger
+from .logging_setup import logger
+
+Message = Union[str, bytes]
+
+class ClientConnection:
+    """
+    A websocket with its own bounded send lanes and writer task
+
+    Broadcasting only enqueues; the writer task drains the lanes at the
+    client's pace, alerts first. Metric snapshots supersede each other, so
+    when a slow client falls queue_size of them behind the oldest is
+    dropped. Alerts are never dropped for a snapshot: they have their own
+    alert_queue_size lane, and only a client that falls that far behind
+    loses (and counts) alerts.
+    """
+    def __init__(self, websocket: WebSocket, queue_size: int, send_timeout: float, on_close,
+                 alert_queue_size: int = 1000):
+        self.websocket = websocket
+        self.queue = deque()
+        self.queue_size = queue_size
+        self.alerts = asyncio.Queue(maxsize=alert_queue_size)
+        self.send_timeout = send_timeout
+        self.dropped = 0
+        self.alerts_dropped = 0
+        self._wakeup = asyncio.Event()
+        self._on_close = on_close
+        self.task = asyncio.get_running_loop().create_task(self._writer())
+
+    def offer(self, message: Message):
+        """Queue a metric snapshot, dropping the oldest one when the lane is full"""
+        if len(self.queue) >= self.queue_size:
+            self.queue.popleft()
+            self.dropped += 1
+        self.queue.append(message)
+        self._wakeup.set()
+
+    def offer_alert(self, message: Message) -> bool:
+        """Queue an alert without waiting; False (and counted) if the alert lane is full"""
+        try:
+            self.alerts.put_nowait(message)
+        except asyncio.QueueFull:
+            self.alerts_dropped += 1
+            logger.warning("Websocket client alert lane full, dropped an alert")
+            return False
+        self._wakeup.set()
+        return True
+
+    async def put_alert(self, message: Message) -> bool:
+        """
+        Send an alert through the alert lane and wait until it was written
+
+        Returns:
+            False if the connection closed before the alert was sent
+        """
+        sent = asyncio.get_running_loop().create_future()
+        put = asyncio.ensure_future(self.alerts.put((message, sent)))
+        for step in (put, sent):
+            done, _ = await asyncio.wait({step, self.task}, return_when=asyncio.FIRST_COMPLETED)
+            if step not in done:
+                step.cancel()
+                return False
+            self._wakeup.set()
+        return True
+
+    def _next(self) -> Optional[Message]:
+        if not self.alerts.empty():
+            return self.alerts.get_nowait()
+        if self.queue:
+            return self.queue.popleft()
+        return None
+
+    async def _writer(self):
+        try:
+            while True:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                message = self._next()
+                while message is not None:
+                    # put_alert() entries carry a future resolved once written
+                    message, sent = message if isinstance(message, tuple) else (message, None)
+                    if isinstance(message, bytes):
+                        send = self.websocket.send_bytes(message)
+                    else:
+                        send = self.websocket.send_text(message)
+                    await asyncio.wait_for(send, timeout=self.send_timeout)
+                    if sent is not None and not sent.done():
+                        sent.set_result(True)
+                    message = self._next()
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            logger.warning(f"Websocket client stalled for {self.send_timeout}s, disconnecting")
+        except Exception as e:
+            logger.error(f"Error sending to client: {str(e)}")
+        # Close the socket too, so the handler's receive loop ends and the
+        # client reconnects instead of sitting on a connection nobody feeds
+        try:
+            await asyncio.wait_for(self.websocket.close(code=1013), timeout=self.send_timeout)
+        except Exception:
+            pass
+        self._on_close(self.websocket)
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: list[WebSocket] = []
-        
+    def __init__(self, queue_size: int = 16, send_timeout: float = 5.0, alert_queue_size: int = 1000):
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.alert_queue_size = alert_queue_size
+        self.clients: Dict[WebSocket, ClientConnection] = {}
+
+    @property
+    def active_connections(self) -> List[WebSocket]:
+        return list(self.clients)
+
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
-        
+        self.clients[websocket] = ClientConnection(websocket, self.queue_size, self.send_timeout,
+                                                   self.disconnect, self.alert_queue_size)
+
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-            
-    async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except Exception as e:
-                logger.error(f"Error broadcasting to client: {str(e)}")
-                await self.disconnect(connection)
+        client = self.clients.pop(websocket, None)
+        if client and client.task is not asyncio.current_task():
+            client.task.cancel()
+
+    def send(self, websocket: WebSocket, message: Message):
+        """Queue a pre-serialized metrics message (superseded by later ones) for one client"""
+        client = self.clients.get(websocket)
+        if client:
+            client.offer(message)
+
+    def send_alert(self, websocket: WebSocket, message: Message) -> bool:
+        """Queue a pre-serialized alert for one client on its alert lane"""
+        client = self.clients.get(websocket)
+        return client.offer_alert(message) if client else False
+
+    async def put_alert(self, websocket: WebSocket, message: Message) -> bool:
+        """Send an alert to one client and wait until it was written; False if it went away"""
+        client = self.clients.get(websocket)
+        return await client.put_alert(message) if client else False
+
+    async def broadcast(self, message: Union[dict, Message]):
+        """
+        Queue a message for every client without waiting on any of them
+
+        Dicts are serialized once and shared by all clients.
+        """
+        if isinstance(message, dict):
+            message = json.dumps(message, default=str)
+        for client in list(self.clients.values()):
+            client.offer(message)
+
+    @property
+    def dropped(self) -> int:
+        return sum(client.dropped for client in self.clients.values())
+
+    @property
+    def alerts_dropped(self) -> int:
+        return sum(client.alerts_dropped for client in self.clients.values())